@@ -1,7 +1,16 @@
 import time
 import os
-import google.generativeai as genai
+import asyncio
+import logging
+import threading
+import weakref
 from dotenv import load_dotenv
+from config import LLM_BACKEND
+from llm_backends import GeminiBackend, FakeLLMBackend
+from resilience import ResiliencePolicy
+from instrumentation import metrics, timed
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -9,46 +18,226 @@ load_dotenv()
 # Get API key and configuration from environment variables
 API_KEY = os.getenv("GEMINI_API_KEY")
 LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
 SITE_URL = os.getenv("SITE_URL", "http://localhost:8501")
 SITE_NAME = os.getenv("SITE_NAME", "Evihian")
 
-if not API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables. Please check your .env file.")
+# Client-side limits on Gemini traffic
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # In-flight async calls per event loop
+LLM_RATE_LIMIT_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_PER_MINUTE", "0"))  # 0 disables rate limiting
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "5"))
+
+def create_backend(name=LLM_BACKEND):
+    """Create the LLM backend selected by name ("gemini" or "fake")."""
+    if name == "fake":
+        return FakeLLMBackend()
+    if name != "gemini":
+        raise ValueError(f"Unknown LLM backend: {name}. Use 'gemini' or 'fake'.")
+
+    if not API_KEY:
+        raise ValueError("GEMINI_API_KEY not found in environment variables. Please check your .env file.")
+    return GeminiBackend(API_KEY, LLM_MODEL, LLM_TEMPERATURE)
+
+# The default backend is created on first use, so importing this module stays cheap
+_default_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Return the backend selected by LLM_BACKEND, creating it on first use."""
+    global _default_backend
+    if _default_backend is None:
+        with _backend_lock:
+            if _default_backend is None:
+                _default_backend = create_backend()
+    return _default_backend
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by sync and async callers."""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
 
-# Configure the Gemini API
-genai.configure(api_key=API_KEY)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
 
-# Create the model
-model = genai.GenerativeModel(LLM_MODEL)
+            # Tokens may go negative; each caller waits for its own reservation
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
 
+    def acquire(self):
+        """Block until a token is available."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a token is available."""
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+rate_limiter = TokenBucket(LLM_RATE_LIMIT_PER_MINUTE, LLM_RATE_LIMIT_BURST)
+resilience = ResiliencePolicy()
+
+# asyncio semaphores belong to one event loop, so keep one per loop
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def _concurrency_limit() -> asyncio.Semaphore:
+    """Return the semaphore bounding in-flight calls on the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
+
+@timed("llm_request_seconds", log_level=logging.INFO)
 def send_request(prompt):
     """Send a single request to the Gemini API and return the result."""
-    print(f"Sending request to Gemini...")
-    start_time = time.time()
-
     try:
-        # Generate content using Gemini
-        response = model.generate_content(prompt)
+        # Generate content using the configured backend
+        return get_backend().generate(prompt)
+    except Exception as e:
+        logger.exception("Error generating content")
+        metrics.increment("llm_errors_total", function="send_request")
+        return f"I apologize, but I encountered an error: {str(e)}. Please try again."
 
-        end_time = time.time()
-        elapsed_time = end_time - start_time
+@timed("llm_request_seconds")
+def generate_text(prompt, cache=None, backend=None, usage=None):
+    """Call the LLM with a prompt and return the response, raising on failure.
 
-        content = response.text
-        print(f"Response: {content[:100]}...")
-        print(f"Generation time: {elapsed_time:.2f} seconds")
+    When a response cache is given, a cached response is returned without
+    calling the API and successful responses are stored in it. The backend
+    defaults to the one selected by LLM_BACKEND. When a `usage` dict is given
+    it receives the "prompt_tokens" and "completion_tokens" of the request
+    whose response was used, or "cached": True for a cache hit.
+    """
+    backend = backend or get_backend()
+    if cache is not None:
+        cached = cache.get(prompt, backend.model_name, backend.temperature)
+        if cached is not None:
+            metrics.increment("llm_cache_hits_total")
+            if usage is not None:
+                usage["cached"] = True
+            return cached
 
-        return content
+    def attempt(timeout):
+        # Every attempt, retries and hedges included, counts against the rate limit
+        rate_limiter.acquire()
+        attempt_usage = {}
+        return backend.generate(prompt, timeout, attempt_usage), attempt_usage
 
+    text, attempt_usage = resilience.call(attempt)
+    if usage is not None:
+        usage.update(attempt_usage)
+
+    if cache is not None:
+        cache.put(prompt, backend.model_name, backend.temperature, text)
+    return text
+
+def call_gemini(prompt, cache=None, backend=None, usage=None):
+    """Call the LLM with a prompt and return the response.
+
+    `usage` is filled as by generate_text, with the "error" on failure.
+    """
+    try:
+        return generate_text(prompt, cache, backend, usage)
     except Exception as e:
-        print(f"Error generating content: {e}")
+        logger.warning("LLM call failed: %s", e)
+        metrics.increment("llm_errors_total", function="call_gemini")
+        if usage is not None:
+            usage["error"] = str(e)
         return f"I apologize, but I encountered an error: {str(e)}. Please try again."
 
-def call_gemini(prompt):
-    """Call the Gemini API with a prompt and return the response."""
+@timed("llm_request_seconds")
+def call_gemini_stream(prompt, cache=None, backend=None, usage=None):
+    """Call the LLM and yield the response text as it is generated.
+
+    `usage` is filled as by call_gemini once the stream has finished.
+    """
+    backend = backend or get_backend()
+    try:
+        if cache is not None:
+            cached = cache.get(prompt, backend.model_name, backend.temperature)
+            if cached is not None:
+                metrics.increment("llm_cache_hits_total")
+                if usage is not None:
+                    usage["cached"] = True
+                yield cached
+                return
+
+        # Retry until the stream starts; a stream that fails midway is not restarted
+        def first_chunk(timeout):
+            rate_limiter.acquire()
+            attempt_usage = {}
+            response = iter(backend.stream(prompt, timeout, attempt_usage))
+            return response, next(response, None), attempt_usage
+
+        response, chunk, attempt_usage = resilience.call(first_chunk)
+        chunks = []
+        while chunk is not None:
+            chunks.append(chunk)
+            yield chunk
+            chunk = next(response, None)
+
+        if usage is not None:
+            usage.update(attempt_usage)
+
+        # Only a stream that completed without errors is cached
+        if cache is not None:
+            cache.put(prompt, backend.model_name, backend.temperature, "".join(chunks))
+    except Exception as e:
+        logger.warning("LLM stream failed: %s", e)
+        metrics.increment("llm_errors_total", function="call_gemini_stream")
+        if usage is not None:
+            usage["error"] = str(e)
+        yield f"I apologize, but I encountered an error: {str(e)}. Please try again."
+
+@timed("llm_request_seconds")
+async def acall_gemini(prompt, cache=None, backend=None, usage=None):
+    """Call the LLM asynchronously, bounded by the concurrency and rate limits.
+
+    `usage` is filled as by call_gemini.
+    """
+    backend = backend or get_backend()
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        # Cache lookups can hit SQLite, so they run off the event loop
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, prompt, backend.model_name, backend.temperature)
+            if cached is not None:
+                metrics.increment("llm_cache_hits_total")
+                if usage is not None:
+                    usage["cached"] = True
+                return cached
+
+        async def attempt(timeout):
+            async with _concurrency_limit():
+                await rate_limiter.acquire_async()
+                attempt_usage = {}
+                return await backend.agenerate(prompt, timeout, attempt_usage), attempt_usage
+
+        text, attempt_usage = await resilience.acall(attempt)
+        if usage is not None:
+            usage.update(attempt_usage)
+
+        if cache is not None:
+            await asyncio.to_thread(cache.put, prompt, backend.model_name, backend.temperature, text)
+        return text
     except Exception as e:
+        logger.warning("LLM call failed: %s", e)
+        metrics.increment("llm_errors_total", function="acall_gemini")
+        if usage is not None:
+            usage["error"] = str(e)
         return f"I apologize, but I encountered an error: {str(e)}. Please try again."
 
 def main():
@@ -58,13 +247,14 @@ def main():
     overall_start_time = time.time()
 
     response = send_request(prompt)
+    print(f"Response: {response[:100]}...")
 
     overall_end_time = time.time()
     overall_elapsed_time = overall_end_time - overall_start_time
 
     print(f"\n===== SUMMARY =====")
     print(f"Total execution time: {overall_elapsed_time:.2f} seconds")
-    print(f"Model used: {LLM_MODEL}")
+    print(f"Model used: {get_backend().model_name}")
 
 if __name__ == "__main__":
     main()
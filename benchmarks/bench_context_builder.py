@@ -0,0 +1,73 @@
+"""
+Benchmark prompt-context building against conversation length.
+
+Simulates conversations of growing length and times building the context
+for one prompt, comparing the old approach (concatenating every AI message
+of the full history) with ContextBuilder over the bounded history window and
+rolling summary the agent keeps. The builder's time should stay flat.
+
+Run from the repository root:
+    python -m benchmarks.bench_context_builder --turns 10 100 1000 10000
+"""
+import argparse
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from config import HISTORY_WINDOW_MESSAGES
+from context_builder import ContextBuilder, estimate_tokens
+
+TUTORIAL = "A tutorial paragraph explaining the subject with an example. " * 60
+QUESTION = "Could you explain how this part works with another example?"
+ANSWER = "Here is a detailed answer. It walks through the idea step by step. " * 15
+
+def conversation(turns: int) -> list:
+    """Return the tutorial followed by `turns` question/answer pairs."""
+    messages = [AIMessage(content=TUTORIAL)]
+    for _ in range(turns):
+        messages += [HumanMessage(content=QUESTION), AIMessage(content=ANSWER)]
+    return messages
+
+def old_context(messages: list) -> str:
+    """The previous ad hoc context: every AI message concatenated, then sliced."""
+    tutorial_content = ""
+    for msg in messages:
+        if isinstance(msg, AIMessage):
+            tutorial_content += msg.content + "\n"
+    return tutorial_content[:1000]
+
+def windowed(builder: ContextBuilder, messages: list) -> tuple:
+    """Return the window and rolling summary the agent would hold after these messages."""
+    window, summary = messages[:1], ""
+    for message in messages[1:]:
+        window.append(message)
+        if len(window) > HISTORY_WINDOW_MESSAGES + 1:
+            summary = builder.fold(summary, [window.pop(1)])
+    return window, summary
+
+def time_call(fn, repeats: int) -> float:
+    """Return the mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Conversation lengths in Q&A turns")
+    parser.add_argument("--repeats", type=int, default=200, help="Prompt builds timed per length")
+    args = parser.parse_args()
+
+    builder = ContextBuilder()
+    print(f"{'turns':>8} {'old us':>10} {'builder us':>12} {'context tokens':>15}")
+    for turns in args.turns:
+        messages = conversation(turns)
+        window, summary = windowed(builder, messages)
+
+        old = time_call(lambda: old_context(messages), args.repeats)
+        new = time_call(lambda: builder.build(window[0].content, window[1:], summary), args.repeats)
+        tokens = estimate_tokens(builder.build(window[0].content, window[1:], summary))
+        print(f"{turns:>8} {old * 1e6:>10.1f} {new * 1e6:>12.1f} {tokens:>15}")
+
+if __name__ == "__main__":
+    main()
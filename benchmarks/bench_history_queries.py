@@ -0,0 +1,99 @@
+"""
+Benchmark history and session queries against database size.
+
+Populates temporary databases with a growing number of messages and times
+get_conversation_history, get_conversations_by_session and an uncached
+get_session_page with the schema indexes in place and again with them dropped
+(the pre-migration layout).
+
+Run from the repository root:
+    python -m benchmarks.bench_history_queries --rows 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from database import TutorialDatabase
+
+MESSAGES_PER_CONVERSATION = 20
+CONVERSATIONS_PER_SESSION = 10
+INDEXES = ["idx_messages_conversation", "idx_messages_timestamp", "idx_conversations_session"]
+
+def populate(db: TutorialDatabase, rows: int):
+    """Fill the database with synthetic conversations totalling `rows` messages."""
+    conversations = max(1, rows // MESSAGES_PER_CONVERSATION)
+
+    with db.connection() as conn, conn:
+        conn.executemany(
+            "INSERT INTO conversations (session_id, subject) VALUES (?, ?)",
+            ((f"session-{i // CONVERSATIONS_PER_SESSION}", f"Subject {i}") for i in range(conversations))
+        )
+        conn.executemany(
+            "INSERT INTO messages (conversation_id, role, content, message_type) VALUES (?, ?, ?, ?)",
+            (
+                (i % conversations + 1, "user" if i % 2 else "assistant", "x" * 200, "chat")
+                for i in range(rows)
+            )
+        )
+
+    return conversations
+
+def time_queries(db: TutorialDatabase, conversations: int, repeats: int) -> tuple:
+    """Return the mean seconds per history lookup and per session lookup."""
+    rng = random.Random(0)
+    sessions = max(1, conversations // CONVERSATIONS_PER_SESSION)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        db.get_conversation_history(rng.randint(1, conversations))
+    history_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        db.get_conversations_by_session(f"session-{rng.randrange(sessions)}")
+    session_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        db._session_pages.clear()
+        db.get_session_page(f"session-{rng.randrange(sessions)}")
+    page_time = (time.perf_counter() - start) / repeats
+
+    return history_time, session_time, page_time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{'rows':>10} | {'history (indexed)':>18} | {'history (scan)':>15} | {'sessions (indexed)':>19} | {'sessions (scan)':>16}"
+        f" | {'page (indexed)':>15} | {'page (scan)':>12}"
+    )
+    print("-" * 125)
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = TutorialDatabase(os.path.join(tmp, "bench.db"))
+            conversations = populate(db, rows)
+
+            indexed = time_queries(db, conversations, args.repeats)
+
+            with db.connection() as conn, conn:
+                for index in INDEXES:
+                    conn.execute(f"DROP INDEX {index}")
+            scanned = time_queries(db, conversations, args.repeats)
+
+            db.close()
+
+        print(
+            f"{rows:>10} | {indexed[0] * 1000:>15.3f} ms | {scanned[0] * 1000:>12.3f} ms"
+            f" | {indexed[1] * 1000:>16.3f} ms | {scanned[1] * 1000:>13.3f} ms"
+            f" | {indexed[2] * 1000:>12.3f} ms | {scanned[2] * 1000:>9.3f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
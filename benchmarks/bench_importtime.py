@@ -0,0 +1,78 @@
+"""
+Benchmark cold-start import time of the application modules.
+
+Imports each module in a fresh interpreter under `python -X importtime` and
+reports the median cumulative time plus the slowest direct dependencies, so
+regressions such as an eager client construction or a heavy top-level import
+show up. With --budget-ms the run fails when a module exceeds the budget.
+
+Run from the repository root:
+    python -m benchmarks.bench_importtime --modules LLM_api tutorial_agent --repeats 5 --budget-ms 1500
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["config", "database", "LLM_api", "tutorial_agent"]
+
+def measure(module: str) -> dict:
+    """Import the module once in a new interpreter.
+
+    Returns the module's cumulative microseconds and those of its direct imports.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+
+    # Lines look like "import time: self | cumulative | <indent>name" and come in
+    # post-order, so a module's direct imports are the depth-1 lines just before it
+    direct = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+
+        if depth == 1:
+            direct[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                return {"total": int(cumulative), "direct": direct}
+            direct = {}
+    raise RuntimeError(f"{module} did not appear in the import trace")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--top", type=int, default=5, help="Slowest direct imports to list per module")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if a module's median import time exceeds this")
+    args = parser.parse_args()
+
+    # Warm the bytecode cache so every run measures imports rather than compilation
+    for module in args.modules:
+        measure(module)
+
+    over_budget = []
+    print(f"{'module':<20} {'median ms':>10} {'min ms':>10}")
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeats)]
+        totals = [run["total"] / 1000 for run in runs]
+        median = statistics.median(totals)
+        print(f"{module:<20} {median:>10.1f} {min(totals):>10.1f}")
+
+        # Direct imports of the module sit one level below it
+        direct = {name: statistics.median(run["direct"].get(name, 0) for run in runs) / 1000 for name in runs[0]["direct"]}
+        for name, ms in sorted(direct.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"    {name:<36} {ms:>8.1f}")
+
+        if args.budget_ms is not None and median > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        sys.exit(f"Over the {args.budget_ms:.0f} ms import budget: {', '.join(over_budget)}")
+
+if __name__ == "__main__":
+    main()
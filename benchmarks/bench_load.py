@@ -0,0 +1,333 @@
+"""
+Load test the agent with many simulated sessions against the fake LLM.
+
+Each simulated session starts a tutorial and then sends a fixed cycle of
+turns (two questions, a "Test Me" request and an answer) through
+start_tutorial and continue_conversation, with several sessions running
+concurrently. Every turn's wall time is split into LLM time (calls made by
+the agent through LLM_api, including retries and caches), database time
+(public TutorialDatabase methods) and the remainder, which is graph,
+checkpoint and prompt-building overhead. Background prefetch and summary
+work is not charged to the turn.
+
+The report covers throughput, p50/p95/p99 turn latency per turn kind, the
+time breakdown and RSS growth. With --json it is written out for comparing
+commits; --compare loads such a report and exits 1 if a metric regressed by
+more than --threshold.
+
+Run from the repository root:
+    python -m benchmarks.bench_load --sessions 50 --concurrency 8 --turns 8 --latency-ms 200
+    python -m benchmarks.bench_load --json after.json --compare before.json
+"""
+import argparse
+import contextvars
+import functools
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+TURN_CYCLE = [
+    ("question", "question", "Can you explain that in more detail?"),
+    ("question", "question", "Can you give me an example?"),
+    ("evaluation", "evaluation_request", "Test me on this"),
+    ("answer", "question", "I think it works by breaking the problem into smaller parts."),
+]
+
+SUBJECTS = ["Python Programming", "Machine Learning", "Docker", "Statistics", "Linear Algebra", "SQL", "Git", "Networking"]
+
+# Metrics compared by --compare, and whether a larger value is worse
+COMPARED_METRICS = {
+    "throughput_turns_per_second": False,
+    "latency_ms.all.p50": True,
+    "latency_ms.all.p95": True,
+    "latency_ms.all.p99": True,
+    "breakdown_ms.db": True,
+    "breakdown_ms.graph": True,
+    "memory_mb.growth_per_1000_turns": True,
+}
+
+# Time spent by the current turn, per category; copied into langgraph's worker threads
+_turn_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("turn_timings", default=None)
+
+def timed(category: str, fn):
+    """Wrap fn so its wall time is added to the current turn's category.
+
+    Only the outermost call is counted, so nested public DB calls are not
+    charged twice. Generators are timed until they are exhausted.
+    """
+    depth = f"{category}_depth"
+
+    def charge(started: float):
+        timings = _turn_timings.get()
+        if timings is not None:
+            timings[depth] -= 1
+            if not timings[depth]:
+                timings[category] += time.perf_counter() - started
+
+    def enter():
+        timings = _turn_timings.get()
+        if timings is not None:
+            timings[depth] = timings.get(depth, 0) + 1
+        return time.perf_counter()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = enter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            charge(started)
+
+    @functools.wraps(fn)
+    def generator_wrapper(*args, **kwargs):
+        started = enter()
+        try:
+            yield from fn(*args, **kwargs)
+        finally:
+            charge(started)
+
+    return generator_wrapper if inspect.isgeneratorfunction(fn) else wrapper
+
+def instrument(agent):
+    """Time the agent's LLM calls and database methods."""
+    import tutorial_agent
+
+    for name in ("call_gemini", "call_gemini_stream", "generate_text"):
+        setattr(tutorial_agent, name, timed("llm", getattr(tutorial_agent, name)))
+
+    skip = {"connection", "unit_of_work", "close", "init_database"}
+    for name in dir(agent.db):
+        method = getattr(agent.db, name)
+        if not name.startswith("_") and name not in skip and callable(method):
+            setattr(agent.db, name, timed("db", method))
+
+def run_turn(kind: str, fn) -> Dict[str, Any]:
+    """Run one turn and return its latency and time breakdown in milliseconds."""
+    timings = {"llm": 0.0, "db": 0.0}
+    token = _turn_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        result = fn()
+        error = result.get("error") if isinstance(result, dict) else None
+    except Exception as e:
+        result, error = None, str(e)
+    finally:
+        total = time.perf_counter() - started
+        _turn_timings.reset(token)
+
+    return {
+        "kind": kind,
+        "total": total * 1000,
+        "llm": timings["llm"] * 1000,
+        "db": timings["db"] * 1000,
+        "graph": max(0.0, total - timings["llm"] - timings["db"]) * 1000,
+        "error": error,
+        "result": result
+    }
+
+def run_session(agent, index: int, turns: int) -> List[Dict[str, Any]]:
+    """Start one tutorial and send `turns` follow-up turns."""
+    subject = SUBJECTS[index % len(SUBJECTS)]
+    tutorial = run_turn("tutorial", lambda: agent.start_tutorial(f"load-{index}", subject))
+    records = [tutorial]
+
+    conversation_id = (tutorial["result"] or {}).get("conversation_id")
+    if conversation_id is not None:
+        for turn in range(turns):
+            kind, input_type, text = TURN_CYCLE[turn % len(TURN_CYCLE)]
+            records.append(run_turn(kind, lambda: agent.continue_conversation(conversation_id, text, input_type)))
+
+    # Keep only the measurements, so the records don't count towards memory growth
+    for record in records:
+        del record["result"]
+    return records
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the nearest-rank percentile of the values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values)
+    }
+
+def rss_mb() -> float:
+    """Return the current resident set size, or the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def git_commit(repo: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=repo, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def lookup(report: Dict[str, Any], path: str) -> Optional[float]:
+    value = report
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Print each compared metric against the baseline; return True if any regressed."""
+    print(f"\ncompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    regressed = False
+    for path, larger_is_worse in COMPARED_METRICS.items():
+        before, after = lookup(baseline, path), lookup(report, path)
+        if before is None or after is None:
+            continue
+
+        change = (after - before) / before if before else 0.0
+        worse = change > threshold if larger_is_worse else change < -threshold
+        regressed = regressed or worse
+        print(f"  {path:<34} {before:>10.2f} -> {after:>10.2f}  {change:+7.1%}{'  REGRESSION' if worse else ''}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="Simulated sessions")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sessions running at once")
+    parser.add_argument("--turns", type=int, default=8, help="Turns per session after the tutorial")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Mean fake LLM latency")
+    parser.add_argument("--distribution", default="lognormal", choices=["constant", "uniform", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake LLM calls that fail")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    # The fake backend reads its settings at import time
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_LATENCY_DISTRIBUTION"] = args.distribution
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+
+    # The agent keeps its databases under ./database, so run in a scratch directory
+    repo = os.getcwd()
+    sys.path.insert(0, repo)
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.makedirs("database")
+
+    from tutorial_agent import TutorialAgent
+    from LLM_api import resilience
+
+    agent = TutorialAgent()
+    instrument(agent)
+
+    # Compile the graph and open the checkpointer before anything is timed
+    run_session(agent, -1, 1)
+    rss_start = rss_mb()
+    rss_peak = rss_start
+    peak_lock = threading.Lock()
+
+    def session(index: int):
+        nonlocal rss_peak
+        records = run_session(agent, index, args.turns)
+        with peak_lock:
+            rss_peak = max(rss_peak, rss_mb())
+        return records
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        records = [record for records in executor.map(session, range(args.sessions)) for record in records]
+    wall = time.perf_counter() - started
+
+    agent.db.flush()
+    rss_end = rss_mb()
+
+    ok = [record for record in records if not record["error"]]
+    if not ok:
+        print("Every turn failed:", records[0]["error"])
+        return 1
+
+    report = {
+        "meta": {
+            "commit": git_commit(repo),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": {key: value for key, value in vars(args).items() if key not in ("json", "compare", "threshold")}
+        },
+        "turns": len(records),
+        "errors": len(records) - len(ok),
+        "wall_seconds": wall,
+        "throughput_turns_per_second": len(records) / wall,
+        "latency_ms": {
+            "all": latency_summary([record["total"] for record in ok]),
+            **{
+                kind: latency_summary([record["total"] for record in ok if record["kind"] == kind])
+                for kind in ["tutorial"] + sorted({kind for kind, _, _ in TURN_CYCLE})
+                if any(record["kind"] == kind for record in ok)
+            }
+        },
+        "breakdown_ms": {
+            category: sum(record[category] for record in ok) / len(ok)
+            for category in ("llm", "db", "graph")
+        },
+        "memory_mb": {
+            "start": rss_start,
+            "peak": rss_peak,
+            "end": rss_end,
+            "growth_per_1000_turns": (rss_end - rss_start) / len(records) * 1000
+        },
+        "agent": {
+            "prefetch": agent.prefetcher.stats() if agent.prefetcher else None,
+            "summarizer": agent.summarizer.stats() if agent.summarizer else None,
+            "response_cache": agent.response_cache.stats() if agent.response_cache else None,
+            "resilience": resilience.stats()
+        }
+    }
+    agent.close()
+
+    print(f"{report['turns']} turns ({report['errors']} failed) in {wall:.1f}s: {report['throughput_turns_per_second']:.1f} turns/s")
+    print(f"\n{'kind':<12} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for kind, summary in report["latency_ms"].items():
+        print(f"{kind:<12} {summary['count']:>6} {summary['p50']:>9.1f} {summary['p95']:>9.1f} {summary['p99']:>9.1f} {summary['max']:>9.1f}")
+
+    breakdown = report["breakdown_ms"]
+    total = sum(breakdown.values())
+    print("\nmean per turn: " + ", ".join(f"{category} {ms:.1f} ms ({ms / total:.0%})" for category, ms in breakdown.items()))
+
+    memory = report["memory_mb"]
+    print(f"RSS: {memory['start']:.0f} MB -> {memory['end']:.0f} MB (peak {memory['peak']:.0f} MB, {memory['growth_per_1000_turns']:+.1f} MB per 1000 turns)")
+
+    if args.json:
+        path = os.path.join(repo, args.json) if not os.path.isabs(args.json) else args.json
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\nreport written to {path}")
+
+    if args.compare:
+        path = os.path.join(repo, args.compare) if not os.path.isabs(args.compare) else args.compare
+        with open(path) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+"""
+Benchmark full-text search latency against corpus size.
+
+Populates temporary databases with synthetic messages drawn from a Zipf-like
+vocabulary (indexed by the FTS5 triggers as they are inserted) and times
+TutorialDatabase.search for common, rare and multi-word queries, across all
+sessions and within one session. "full rank" scores every match (no
+candidate cap) to show what the cap saves on common words, and a LIKE scan of
+the rare word shows what searching without the index would cost.
+
+Run from the repository root:
+    python -m benchmarks.bench_search --rows 100000 1000000 3000000
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from database import TutorialDatabase
+
+MESSAGES_PER_CONVERSATION = 20
+CONVERSATIONS_PER_SESSION = 10
+VOCABULARY = [f"term{i}" for i in range(20000)]
+WORDS_PER_MESSAGE = 60
+
+QUERIES = {
+    "common word": "term1",
+    "rare word": "term15000",
+    "two words": "term3 term40",
+    "three words": "term2 term50 term700"
+}
+
+def populate(db: TutorialDatabase, rows: int, rng: random.Random) -> int:
+    """Fill the database with synthetic conversations totalling `rows` messages."""
+    conversations = max(1, rows // MESSAGES_PER_CONVERSATION)
+    # Word frequencies fall off roughly as 1/rank, like natural text
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+    # Conversations are written one after another, so each session's
+    # messages cover a contiguous span of IDs as they would in real use
+    def messages():
+        for i in range(rows):
+            content = " ".join(rng.choices(VOCABULARY, cum_weights=cumulative, k=WORDS_PER_MESSAGE))
+            yield (min(conversations, i // MESSAGES_PER_CONVERSATION + 1), "user" if i % 2 else "assistant", content, "answer")
+
+    with db.connection() as conn, conn:
+        conn.executemany(
+            "INSERT INTO conversations (session_id, subject) VALUES (?, ?)",
+            ((f"session-{i // CONVERSATIONS_PER_SESSION}", f"Subject {i}") for i in range(conversations))
+        )
+        conn.executemany(
+            "INSERT INTO messages (conversation_id, role, content, message_type) VALUES (?, ?, ?, ?)",
+            messages()
+        )
+
+    return conversations
+
+def mean_ms(fn, repeats: int) -> float:
+    """Return the mean milliseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20, help="Results per search")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'load s':>8} | {'query':<12} {'all sessions':>13} {'one session':>12} {'full rank':>10} | {'LIKE scan':>10}  (ms)")
+    print("-" * 93)
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = TutorialDatabase(os.path.join(tmp, "bench.db"))
+
+            start = time.perf_counter()
+            conversations = populate(db, rows, random.Random(0))
+            session = f"session-{conversations // CONVERSATIONS_PER_SESSION // 2}"
+            load = time.perf_counter() - start
+
+            with db.connection() as conn:
+                def like_scan():
+                    conn.execute(
+                        "SELECT id FROM messages WHERE content LIKE ? LIMIT ?", (f"%{QUERIES['rare word']} %", args.limit)
+                    ).fetchall()
+                scan = mean_ms(like_scan, max(1, args.repeats // 10))
+
+            for i, (label, query) in enumerate(QUERIES.items()):
+                every = mean_ms(lambda: db.search(query, limit=args.limit), args.repeats)
+                one = mean_ms(lambda: db.search(query, session_id=session, limit=args.limit), args.repeats)
+                full = mean_ms(lambda: db.search(query, limit=args.limit, candidates=rows), max(1, args.repeats // 10))
+                prefix = f"{rows:>10} {load:>8.1f}" if i == 0 else " " * 19
+                tail = f"{scan:>10.2f}" if label == "rare word" else ""
+                print(f"{prefix} | {label:<12} {every:>13.2f} {one:>12.2f} {full:>10.2f} | {tail}")
+
+            db.close()
+
+if __name__ == "__main__":
+    main()
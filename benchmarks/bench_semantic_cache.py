@@ -0,0 +1,79 @@
+"""
+Benchmark semantic cache lookup latency against index size.
+
+Fills a temporary SemanticCache with synthetic (subject, question, answer)
+entries and times lookup() for paraphrased and unrelated questions.
+
+Run from the repository root:
+    python -m benchmarks.bench_semantic_cache --entries 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from semantic_cache import SemanticCache
+
+MODEL, TEMPERATURE = "bench", 0.7
+SUBJECTS = ["Python Programming", "Machine Learning", "Docker", "Statistics", "Linear Algebra"]
+TEMPLATES = [
+    "Can you explain {topic} in more detail?",
+    "What are some real-world applications of {topic}?",
+    "Can you provide more examples of {topic}?",
+    "What should I learn after {topic}?",
+    "How does {topic} compare to the alternatives?"
+]
+
+def synthetic_entries(count: int, rng: random.Random):
+    """Generate `count` distinct questions spread across a few subjects."""
+    for i in range(count):
+        topic = f"concept {i}"
+        question = rng.choice(TEMPLATES).format(topic=topic)
+        yield rng.choice(SUBJECTS), question, f"Answer about {topic}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+
+    print(f"{'entries':>10} | {'build':>9} | {'lookup mean':>12} | {'lookup p99':>11} | {'hit rate':>8}")
+    print("-" * 63)
+
+    for count in args.entries:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SemanticCache(os.path.join(tmp, "semantic.db"), max_entries=count)
+            entries = list(synthetic_entries(count, rng))
+
+            start = time.perf_counter()
+            cache.add_many(entries, MODEL, TEMPERATURE)
+            build_time = time.perf_counter() - start
+
+            # Half the lookups repeat a cached question with different casing, half are unseen
+            timings = []
+            for i in range(args.lookups):
+                subject, question, _ = rng.choice(entries)
+                if i % 2:
+                    question = f"Tell me something new about topic {rng.random()}"
+                else:
+                    question = question.upper()
+
+                start = time.perf_counter()
+                cache.lookup(subject, question, MODEL, TEMPERATURE)
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            stats = cache.stats()
+
+        mean = sum(timings) / len(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(
+            f"{count:>10} | {build_time:>8.2f}s | {mean * 1000:>9.3f} ms | {p99 * 1000:>8.3f} ms"
+            f" | {stats['hit_rate']:>8.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
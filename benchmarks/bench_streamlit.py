@@ -0,0 +1,151 @@
+"""
+Benchmark server time per chat turn in the Streamlit app.
+
+Drives streamlit_app.py headlessly with Streamlit's AppTest against a
+zero-latency fake LLM. A conversation with a long history is loaded, and then
+questions are sent with the Send button. The app's own work per turn is timed:
+
+- "full run": one complete script run for the interaction, including the
+  st.rerun() it triggers. This is what every turn cost before the chat moved
+  into a fragment, and what any full rerun still costs.
+- "chat fragment": the time spent in the render_chat fragment. In the browser
+  a turn only reruns this fragment, so this is the server time per turn now.
+
+AppTest always executes the whole script, so the fragment is timed by
+wrapping st.fragment. Pass an older copy of the app with --baseline to time
+its full runs as well, e.g.:
+    git show <commit>:streamlit_app.py > /tmp/streamlit_app_old.py
+
+Run from the repository root:
+    python -m benchmarks.bench_streamlit --history 10 100 500 --baseline /tmp/streamlit_app_old.py
+"""
+import argparse
+import functools
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from collections import defaultdict
+
+# Time the app, not the LLM or background work
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_LATENCY_DISTRIBUTION", "constant")
+os.environ.setdefault("FAKE_LLM_RESPONSE_WORDS", "150")
+os.environ.setdefault("PREFETCH_EVALUATIONS", "false")
+os.environ.setdefault("SUMMARY_ENABLED", "false")
+
+import streamlit as st
+
+# Seconds spent in each fragment body, by function name
+fragment_seconds = defaultdict(float)
+
+def timed_fragment(func=None, **kwargs):
+    """Stand-in for st.fragment that records how long each fragment body runs."""
+    if func is None:
+        return lambda f: timed_fragment(f, **kwargs)
+
+    @functools.wraps(func)
+    def body(*args, **inner_kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **inner_kwargs)
+        finally:
+            fragment_seconds[func.__name__] += time.perf_counter() - start
+
+    return real_fragment(body, **kwargs)
+
+real_fragment = st.fragment
+st.fragment = timed_fragment
+
+def seed(db, session_id: str, history: int, conversations: int) -> int:
+    """Create `conversations` conversations in the session; return one with `history` messages."""
+    for i in range(conversations - 1):
+        db.create_conversation(session_id, f"Subject {i}")
+
+    conversation_id = db.create_conversation(session_id, "Benchmarking")
+    db.add_messages(
+        [{"conversation_id": conversation_id, "role": "assistant", "content": "Tutorial. " * 300, "message_type": "tutorial"}] +
+        [
+            {
+                "conversation_id": conversation_id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": "A question?" if i % 2 == 0 else "An answer. " * 60,
+                "message_type": "question" if i % 2 == 0 else "answer"
+            }
+            for i in range(history)
+        ]
+    )
+    db.flush()
+    return conversation_id
+
+def time_turns(script: str, session_id: str, conversation_id: int, turns: int) -> tuple:
+    """Return mean (full run, chat fragment) milliseconds per turn for the app script."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(script, default_timeout=60)
+    at.session_state.session_id = session_id
+    at.run()
+    at.button(key=f"load_{conversation_id}").click().run()
+
+    # The first turn also compiles the graph and writes the conversation's first checkpoint
+    full, fragment = 0.0, 0.0
+    for turn in range(-1, turns):
+        at.text_input(key="user_input").input(f"Question {turn}?")
+        send = next(button for button in at.button if button.label == "Send 💬")
+
+        fragment_seconds.clear()
+        start = time.perf_counter()
+        send.click().run()
+        if turn >= 0:
+            full += time.perf_counter() - start
+            fragment += fragment_seconds["render_chat"]
+
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    return full / turns * 1000, fragment / turns * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 100, 500], help="Messages in the loaded conversation")
+    parser.add_argument("--conversations", type=int, default=50, help="Conversations listed in the sidebar")
+    parser.add_argument("--turns", type=int, default=5, help="Turns timed per history size")
+    parser.add_argument("--baseline", help="Older streamlit_app.py to time for comparison")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    # The app reads theme.css and ./database relative to the working directory
+    repo = os.getcwd()
+    sys.path.insert(0, repo)
+    workdir = tempfile.mkdtemp()
+    shutil.copy(os.path.join(repo, "theme.css"), workdir)
+    os.chdir(workdir)
+    os.makedirs("database")
+
+    from database import TutorialDatabase
+    db = TutorialDatabase()
+
+    script = os.path.join(repo, "streamlit_app.py")
+    baseline = os.path.abspath(os.path.join(repo, args.baseline)) if args.baseline else None
+
+    header = f"{'history':>8} {'full run':>9} {'chat fragment':>14}"
+    print(header + (f" {'baseline full run':>18}" if baseline else "") + "  (ms per turn)")
+    for history in args.history:
+        session_id = f"bench-{history}"
+        conversation_id = seed(db, session_id, history, args.conversations)
+
+        full, fragment = time_turns(script, session_id, conversation_id, args.turns)
+        line = f"{history:>8} {full:>9.1f} {fragment:>14.1f}"
+
+        if baseline:
+            old_full, _ = time_turns(baseline, session_id, conversation_id, args.turns)
+            line += f" {old_full:>18.1f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
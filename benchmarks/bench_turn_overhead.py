@@ -0,0 +1,90 @@
+"""
+Benchmark per-turn overhead of checkpointed graph turns against replaying state.
+
+Runs question turns against a zero-latency fake LLM so only the agent's own
+work is timed. "replay" rebuilds the state from the message log and calls the
+node directly (the previous approach); "graph" runs the turn through the
+compiled graph, which loads the conversation's SQLite checkpoint. State
+loading alone is timed separately.
+
+Run from the repository root:
+    python -m benchmarks.bench_turn_overhead --history 10 100 1000 --turns 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Time the agent, not the LLM or background work
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_LATENCY_DISTRIBUTION", "constant")
+os.environ.setdefault("PREFETCH_EVALUATIONS", "false")
+os.environ.setdefault("SUMMARY_ENABLED", "false")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+
+from langchain_core.messages import HumanMessage
+
+def mean_ms(fn, repeats: int) -> float:
+    """Return the mean milliseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def seed_conversation(agent, messages: int) -> int:
+    """Create a conversation with a tutorial and `messages` further messages."""
+    conversation_id = agent.db.create_conversation("bench", "Benchmarking")
+    agent.db.add_messages(
+        [{"conversation_id": conversation_id, "role": "assistant", "content": "Tutorial. " * 300, "message_type": "tutorial"}] +
+        [
+            {
+                "conversation_id": conversation_id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": "A question?" if i % 2 == 0 else "An answer. " * 60,
+                "message_type": "question" if i % 2 == 0 else "answer"
+            }
+            for i in range(messages)
+        ]
+    )
+    return conversation_id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 100, 1000], help="Messages already in the conversation")
+    parser.add_argument("--turns", type=int, default=200, help="Turns timed per approach")
+    args = parser.parse_args()
+
+    # The agent keeps its databases under ./database, so run in a scratch directory
+    sys.path.insert(0, os.getcwd())
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.makedirs("database")
+
+    from tutorial_agent import TutorialAgent
+    agent = TutorialAgent()
+
+    print(f"{'history':>8} {'load replay':>12} {'load ckpt':>10} {'turn replay':>12} {'turn graph':>11}  (ms)")
+    for history in args.history:
+        replay_id = seed_conversation(agent, history)
+        graph_id = seed_conversation(agent, history)
+
+        # The first graph turn replays the log once and writes the checkpoint
+        agent.continue_conversation(graph_id, "warm up")
+        thread = agent.checkpointer.thread(graph_id)
+
+        load_replay = mean_ms(lambda: agent._load_state(replay_id), args.turns)
+        load_checkpoint = mean_ms(lambda: agent.graph.get_state(thread), args.turns)
+
+        def replay_turn():
+            state = agent._load_state(replay_id)
+            agent._handle_question({**state, "messages": state["messages"] + [HumanMessage(content="A question?")]})
+
+        turn_replay = mean_ms(replay_turn, args.turns)
+        turn_graph = mean_ms(lambda: agent.continue_conversation(graph_id, "A question?"), args.turns)
+
+        print(f"{history:>8} {load_replay:>12.2f} {load_checkpoint:>10.2f} {turn_replay:>12.2f} {turn_graph:>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+SQLite checkpointer holding each conversation's graph state, keyed by conversation id.
+"""
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from config import CHECKPOINT_DB_PATH, CHECKPOINT_PRUNE_EVERY_TURNS, CHECKPOINT_PRUNE_TRACKED, DATABASE_SYNCHRONOUS
+
+class ConversationCheckpointer(SqliteSaver):
+    """SqliteSaver usable from both invoke and ainvoke.
+
+    SqliteSaver only implements the sync interface; the async methods here run
+    it on a worker thread so one saver serves every session and event loop.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        prune_every: int = CHECKPOINT_PRUNE_EVERY_TURNS,
+        max_tracked: int = CHECKPOINT_PRUNE_TRACKED,
+        **kwargs
+    ):
+        super().__init__(conn, **kwargs)
+        self.prune_every = max(1, prune_every)
+        self.max_tracked = max(1, max_tracked)
+
+        # conversation_id -> turns since its last prune, least recently active first
+        self._turns: "OrderedDict[int, int]" = OrderedDict()
+        self._turns_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str = CHECKPOINT_DB_PATH) -> "ConversationCheckpointer":
+        """Open (creating if needed) the checkpoint database at path."""
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={DATABASE_SYNCHRONOUS}")
+        return cls(conn)
+
+    @staticmethod
+    def thread(conversation_id: int) -> Dict[str, Any]:
+        """Return the run config addressing a conversation's checkpoints."""
+        return {"configurable": {"thread_id": str(conversation_id)}}
+
+    def finish_turn(self, conversation_id: int):
+        """Count a finished turn, pruning the conversation every `prune_every` turns."""
+        # Superseded checkpoints are only dead weight, so a few may pile up between prunes
+        # rather than paying a DELETE and a commit on every turn
+        evicted = None
+        with self._turns_lock:
+            turns = self._turns.pop(conversation_id, 0) + 1
+            if turns < self.prune_every:
+                self._turns[conversation_id] = turns
+                if len(self._turns) <= self.max_tracked:
+                    return
+
+                # Conversations that went quiet are pruned as they fall out of the counter
+                evicted, _ = self._turns.popitem(last=False)
+
+        self.prune(evicted if evicted is not None else conversation_id)
+
+    def prune(self, conversation_id: int):
+        """Delete all but the latest checkpoint of a conversation; the messages table keeps the history."""
+        self.setup()
+        thread_id = str(conversation_id)
+        with self.cursor() as cur:
+            for table in ("checkpoints", "writes"):
+                cur.execute(f'''
+                    DELETE FROM {table}
+                    WHERE thread_id = ? AND checkpoint_id < (
+                        SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?
+                    )
+                ''', (thread_id, thread_id))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,116 @@
+"""
+Command-line maintenance tasks for the Evihian.
+
+Usage:
+    python cli.py prewarm [--subjects "Docker" "Git"] [--workers 4] [--force]
+    python cli.py batch --session class-a --subjects "Docker" "Git" [--workers 8]
+    python cli.py batch --file requests.csv [--workers 8]
+    python cli.py report [--by session|subject|conversation|node|day] [--days 7] [--session class-a]
+
+Set METRICS_EXPORT_FILE to write the timings of a run to a file when it exits.
+"""
+import argparse
+import csv
+
+from config import PREWARM_WORKERS, BATCH_WORKERS
+from instrumentation import configure_logging
+from database import TutorialDatabase, USAGE_GROUPS
+from tutorial_agent import TutorialAgent
+
+def prewarm(args):
+    """Pre-generate tutorials for the example subjects (or the given ones)."""
+    agent = TutorialAgent()
+    try:
+        results = agent.prewarm_tutorials(args.subjects, max_workers=args.workers, force=args.force)
+    finally:
+        agent.close()
+
+    for subject, outcome in sorted(results.items()):
+        print(f"{subject:<30} {outcome}")
+
+    failures = [subject for subject, outcome in results.items() if outcome.startswith("failed")]
+    return 1 if failures else 0
+
+def batch(args):
+    """Start tutorials for many (session_id, subject) pairs in one go."""
+    if args.file:
+        with open(args.file, newline="", encoding="utf-8") as f:
+            requests = [(row[0].strip(), row[1].strip()) for row in csv.reader(f) if len(row) >= 2 and row[0].strip()]
+    else:
+        requests = [(args.session, subject) for subject in args.subjects or []]
+
+    if not requests:
+        print("No tutorials requested")
+        return 1
+
+    agent = TutorialAgent()
+    try:
+        results = agent.start_tutorials(requests, max_workers=args.workers)
+    finally:
+        agent.close()
+
+    for result in results:
+        outcome = f"failed: {result['error']}" if result["error"] else f"conversation {result['conversation_id']} ({result['source']})"
+        reused = " [deduplicated]" if result["deduplicated"] else ""
+        print(f"{result['session_id']:<20} {result['subject']:<30} {result['latency']:6.2f}s  {outcome}{reused}")
+
+    failures = [result for result in results if result["error"]]
+    unique = len(results) - sum(result["deduplicated"] for result in results)
+    print(f"\n{len(results) - len(failures)}/{len(results)} started, {unique} unique subjects, {len(failures)} failed")
+    return 1 if failures else 0
+
+def report(args):
+    """Print LLM token usage, latency and cost, grouped and most expensive first."""
+    rows = TutorialDatabase().get_llm_usage(args.by, days=args.days, session_id=args.session, limit=args.limit)
+
+    if not rows:
+        print("No LLM calls recorded")
+        return 0
+
+    print(f"{args.by:<30} {'calls':>6} {'cached':>6} {'errors':>6} {'prompt tok':>11} {'compl. tok':>11} {'prompt/call':>11} {'mean ms':>8} {'max ms':>8} {'cost $':>9}")
+    for row in rows:
+        key = "(none)" if row["key"] is None else str(row["key"])[:30]
+        paid = row["calls"] - row["cached"] - row["errors"]
+        per_call = row["prompt_tokens"] / paid if paid else 0
+        print(
+            f"{key:<30} {row['calls']:>6} {row['cached']:>6} {row['errors']:>6} {row['prompt_tokens']:>11,} {row['completion_tokens']:>11,} "
+            f"{per_call:>11,.0f} {row['mean_latency_ms']:>8.0f} {row['max_latency_ms']:>8.0f} {row['cost']:>9.4f}"
+        )
+
+    print(
+        f"\n{sum(row['calls'] for row in rows)} calls, "
+        f"{sum(row['prompt_tokens'] for row in rows):,} prompt and {sum(row['completion_tokens'] for row in rows):,} completion tokens, "
+        f"${sum(row['cost'] for row in rows):.4f}" + (f" in the top {args.limit} groups" if len(rows) == args.limit else "")
+    )
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Evihian maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prewarm_parser = subparsers.add_parser("prewarm", help="Pre-generate tutorials so they are served instantly")
+    prewarm_parser.add_argument("--subjects", nargs="+", help="Subjects to generate (defaults to config.EXAMPLE_SUBJECTS)")
+    prewarm_parser.add_argument("--workers", type=int, default=PREWARM_WORKERS, help="Parallel LLM calls")
+    prewarm_parser.add_argument("--force", action="store_true", help="Regenerate even if a fresh copy exists")
+    prewarm_parser.set_defaults(func=prewarm)
+
+    batch_parser = subparsers.add_parser("batch", help="Start tutorials for many sessions and subjects at once")
+    batch_parser.add_argument("--session", default="batch", help="Session ID for --subjects")
+    batch_parser.add_argument("--subjects", nargs="+", help="Subjects to start in the session")
+    batch_parser.add_argument("--file", help="CSV file of session_id,subject rows")
+    batch_parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Parallel LLM calls")
+    batch_parser.set_defaults(func=batch)
+
+    report_parser = subparsers.add_parser("report", help="Show LLM token usage, latency and cost")
+    report_parser.add_argument("--by", choices=list(USAGE_GROUPS), default="session", help="How to group LLM calls")
+    report_parser.add_argument("--days", type=float, help="Only count calls from the last N days")
+    report_parser.add_argument("--session", help="Only count calls in this session")
+    report_parser.add_argument("--limit", type=int, default=20, help="Groups to show")
+    report_parser.set_defaults(func=report)
+
+    args = parser.parse_args()
+    configure_logging()
+    return args.func(args)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,11 +9,99 @@ load_dotenv()
 
 # Database Configuration
 DATABASE_PATH = os.getenv("DATABASE_PATH", "tutorial_agent.db")
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))  # Max open connections per TutorialDatabase
+DATABASE_BUSY_TIMEOUT = float(os.getenv("DATABASE_BUSY_TIMEOUT", "10"))  # Seconds to wait on locks / a free connection
+DATABASE_CACHE_SIZE_KB = int(os.getenv("DATABASE_CACHE_SIZE_KB", "16384"))  # Page cache per connection
+DATABASE_SYNCHRONOUS = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL")  # Safe with WAL, avoids an fsync per commit
+DATABASE_WRITE_BEHIND = os.getenv("DATABASE_WRITE_BEHIND", "false").lower() == "true"  # Persist messages on a background thread
+DATABASE_WRITE_QUEUE_SIZE = int(os.getenv("DATABASE_WRITE_QUEUE_SIZE", "1000"))  # Pending batches before writers block
+DATABASE_WRITE_BATCH_SIZE = int(os.getenv("DATABASE_WRITE_BATCH_SIZE", "500"))  # Max messages per group commit
+SESSION_LIST_PAGE_SIZE = int(os.getenv("SESSION_LIST_PAGE_SIZE", "20"))  # Conversations per sidebar page
+SESSION_LIST_PREVIEW_CHARS = int(os.getenv("SESSION_LIST_PREVIEW_CHARS", "40"))  # Subject characters returned per listed conversation
+SESSION_LIST_CACHE_SIZE = int(os.getenv("SESSION_LIST_CACHE_SIZE", "1024"))  # Sessions whose listed pages are kept in memory
 
 # LLM Configuration
 LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/llama-4-scout")
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
 MAX_CONTEXT_MESSAGES = 5  # Number of previous messages to include for context
+HISTORY_WINDOW_MESSAGES = int(os.getenv("HISTORY_WINDOW_MESSAGES", "20"))  # Recent messages the agent loads/keeps per conversation
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))  # Messages the UI loads per page
+SEARCH_RESULTS_LIMIT = int(os.getenv("SEARCH_RESULTS_LIMIT", "10"))  # Matches shown by the sidebar search
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))  # Most recent matches ranked per search
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "gemini" or "fake"
+
+# Fake LLM Backend Configuration (LLM_BACKEND=fake)
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))  # Mean latency of a full response
+FAKE_LLM_LATENCY_DISTRIBUTION = os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "lognormal")  # constant, uniform or lognormal
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))  # Spread of the lognormal distribution
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))  # Fraction of calls that fail
+FAKE_LLM_ERROR_CODE = int(os.getenv("FAKE_LLM_ERROR_CODE", "503"))
+FAKE_LLM_STREAM_CHUNKS = int(os.getenv("FAKE_LLM_STREAM_CHUNKS", "20"))
+FAKE_LLM_RESPONSE_WORDS = int(os.getenv("FAKE_LLM_RESPONSE_WORDS", "200"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# Prompt Context Budget Configuration
+CONTEXT_BUDGET_TOKENS = int(os.getenv("CONTEXT_BUDGET_TOKENS", "2000"))  # Context tokens per prompt, excluding instructions
+CONTEXT_TUTORIAL_TOKENS = int(os.getenv("CONTEXT_TUTORIAL_TOKENS", "600"))  # Share of the budget for the tutorial
+CONTEXT_MESSAGE_MAX_TOKENS = int(os.getenv("CONTEXT_MESSAGE_MAX_TOKENS", "400"))  # Longest excerpt of a single message
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300"))  # Rolling summary of turns older than the window
+
+# Conversation Summary Configuration
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"  # LLM summaries of turns older than the history window
+SUMMARY_EVERY_TURNS = int(os.getenv("SUMMARY_EVERY_TURNS", "5"))  # Turns that must leave the window before the summary is updated
+SUMMARY_MAX_MESSAGES = int(os.getenv("SUMMARY_MAX_MESSAGES", "40"))  # Messages folded in per LLM call
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "1"))
+
+# LLM Resilience Configuration
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "60"))  # Timeout for a single request
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "120"))  # Budget for a call including retries
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))  # Consecutive failures that open the circuit
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"  # Send a second request when the first is slower than p95
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+
+# Graph Checkpoint Configuration
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "database/checkpoints.db")  # Latest graph state per conversation
+CHECKPOINT_PRUNE_EVERY_TURNS = int(os.getenv("CHECKPOINT_PRUNE_EVERY_TURNS", "10"))  # Turns between deletes of a conversation's superseded checkpoints
+CHECKPOINT_PRUNE_TRACKED = int(os.getenv("CHECKPOINT_PRUNE_TRACKED", "10000"))  # Conversations whose turn counts are kept; the least recent is pruned and forgotten
+
+# Response Cache Configuration
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "database/response_cache.db")
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "128"))
+RESPONSE_CACHE_DISK_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_ENTRIES", "5000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Graph nodes whose prompts are deterministic enough to cache; answers and feedback stay fresh
+RESPONSE_CACHE_NODES = [node.strip() for node in os.getenv("RESPONSE_CACHE_NODES", "generate_tutorial").split(",") if node.strip()]
+
+# Semantic Answer Cache Configuration
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"  # Reuse answers to near-identical questions
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "database/semantic_cache.db")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # Cosine similarity needed for a hit
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "256"))
+
+# Pre-warmed Tutorial Configuration
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "false").lower() == "true"  # Generate EXAMPLE_SUBJECTS when the app starts
+PREWARM_MAX_AGE_SECONDS = float(os.getenv("PREWARM_MAX_AGE_SECONDS", str(7 * 24 * 3600)))  # Older tutorials are regenerated
+PREWARM_WORKERS = int(os.getenv("PREWARM_WORKERS", "4"))
+
+# Batch Tutorial Configuration
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))  # Parallel LLM calls when starting many tutorials at once
+
+# LLM Usage Accounting Configuration
+LLM_USAGE_TRACKING = os.getenv("LLM_USAGE_TRACKING", "true").lower() == "true"  # Record tokens and latency of every LLM call
+LLM_PROMPT_COST_PER_MTOK = float(os.getenv("LLM_PROMPT_COST_PER_MTOK", "0.10"))  # USD per million prompt tokens
+LLM_COMPLETION_COST_PER_MTOK = float(os.getenv("LLM_COMPLETION_COST_PER_MTOK", "0.40"))  # USD per million completion tokens
+
+# Evaluation Prefetch Configuration
+PREFETCH_EVALUATIONS = os.getenv("PREFETCH_EVALUATIONS", "true").lower() == "true"  # Generate the next "Test Me" question ahead of time
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "256"))  # Oldest prefetches are discarded beyond this
 
 # Site Configuration
 SITE_URL = os.getenv("SITE_URL", "http://localhost:8501")
@@ -146,6 +234,12 @@ EXAMPLE_SUBJECTS = [
 ]
 
 # Logging Configuration
-ENABLE_LOGGING = True
-LOG_LEVEL = "INFO"
-LOG_FILE = "tutorial_agent.log"
+ENABLE_LOGGING = os.getenv("ENABLE_LOGGING", "true").lower() == "true"  # JSON log lines from the app and CLI
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # DEBUG also logs every timed span
+LOG_FILE = os.getenv("LOG_FILE", "tutorial_agent.log")  # Empty logs to stderr
+
+# Metrics Configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Time nodes, LLM calls and database methods
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))  # Recent durations kept per series for p50/p95/p99
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve /metrics and /metrics.json on localhost; 0 disables
+METRICS_EXPORT_FILE = os.getenv("METRICS_EXPORT_FILE", "")  # Write the metrics here at exit (.prom for Prometheus text, else JSON)
@@ -0,0 +1,100 @@
+"""
+Token-budgeted prompt context: the tutorial, a rolling summary and recent turns.
+"""
+import math
+import re
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from config import CONTEXT_BUDGET_TOKENS, CONTEXT_TUTORIAL_TOKENS, CONTEXT_MESSAGE_MAX_TOKENS, CONTEXT_SUMMARY_TOKENS
+
+# Roughly four characters per token for English text with Gemini-family tokenizers
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text locally, in constant time."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_tokens(text: str, tokens: int) -> str:
+    """Cut text to about `tokens` tokens, marking the cut."""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + "..."
+
+def speaker(message: BaseMessage) -> str:
+    """Label a message by its type, e.g. "Human" or "AI"."""
+    return message.__class__.__name__[:-7]
+
+class ContextBuilder:
+    """Builds prompt context within a token budget.
+
+    The tutorial gets a fixed share of the budget, then the rolling summary of
+    turns that have left the history window, then as many of the most recent
+    turns as still fit, newest first. Callers pass the bounded message window
+    kept in the agent state, so building a prompt costs the same however long
+    the conversation has run.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = CONTEXT_BUDGET_TOKENS,
+        tutorial_tokens: int = CONTEXT_TUTORIAL_TOKENS,
+        message_tokens: int = CONTEXT_MESSAGE_MAX_TOKENS,
+        summary_tokens: int = CONTEXT_SUMMARY_TOKENS
+    ):
+        self.budget_tokens = budget_tokens
+        self.tutorial_tokens = tutorial_tokens
+        self.message_tokens = message_tokens
+        self.summary_tokens = summary_tokens
+
+    def build(self, tutorial: Optional[str], turns: List[BaseMessage], summary: str = "") -> str:
+        """Return the context for a prompt from the tutorial, the summary and the recent turns."""
+        sections = []
+        remaining = self.budget_tokens
+
+        # Headers and separators count against the budget too
+        if tutorial:
+            excerpt = truncate_tokens(tutorial, min(self.tutorial_tokens, remaining))
+            sections.append(f"Tutorial:\n{excerpt}")
+            remaining -= estimate_tokens(sections[-1]) + 1
+
+        if summary and remaining > 0:
+            excerpt = truncate_tokens(summary, min(self.summary_tokens, remaining))
+            sections.append(f"Earlier in the conversation:\n{excerpt}")
+            remaining -= estimate_tokens(sections[-1]) + 1
+
+        # Walk back from the newest turn until the budget runs out
+        recent = []
+        remaining -= estimate_tokens("Recent conversation:\n")
+        for message in reversed(turns):
+            label = f"{speaker(message)}: "
+            available = min(self.message_tokens, remaining - estimate_tokens(label) - 1)
+            if available <= 0:
+                break
+            recent.append(label + truncate_tokens(message.content, available))
+            remaining -= estimate_tokens(recent[-1]) + 1
+
+        if recent:
+            sections.append("Recent conversation:\n" + "\n".join(reversed(recent)))
+
+        return "\n\n".join(sections)
+
+    def fold(self, summary: str, dropped: List[BaseMessage]) -> str:
+        """Fold turns leaving the history window into the rolling summary.
+
+        Each turn is reduced to its first sentence and the oldest lines are
+        dropped once the summary exceeds its budget, so the cost depends only
+        on the turns being folded in.
+        """
+        lines = summary.splitlines() if summary else []
+        for message in dropped:
+            first_sentence = _SENTENCE_END.split(message.content.strip(), maxsplit=1)[0]
+            lines.append(f"{speaker(message)}: {truncate_tokens(first_sentence, self.message_tokens // 4)}")
+
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
@@ -1,89 +1,634 @@
+import re
 import sqlite3
 import json
+import atexit
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from config import (
+    DATABASE_POOL_SIZE, DATABASE_BUSY_TIMEOUT, DATABASE_CACHE_SIZE_KB, DATABASE_SYNCHRONOUS,
+    DATABASE_WRITE_BEHIND, DATABASE_WRITE_QUEUE_SIZE, DATABASE_WRITE_BATCH_SIZE, SEARCH_MAX_CANDIDATES,
+    SESSION_LIST_PAGE_SIZE, SESSION_LIST_PREVIEW_CHARS, SESSION_LIST_CACHE_SIZE,
+    LLM_PROMPT_COST_PER_MTOK, LLM_COMPLETION_COST_PER_MTOK
+)
+from instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+# Schema migrations, applied in order by init_database. The position in the
+# list is the schema version recorded in PRAGMA user_version, so existing
+# database files are upgraded in place. Only ever append to this list.
+MIGRATIONS = [
+    # 1: base tables
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id INTEGER,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            message_type TEXT DEFAULT 'chat',
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+        )
+        '''
+    ],
+    # 2: indexes for history and session lookups
+    [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation
+        ON messages (conversation_id, id)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_messages_timestamp
+        ON messages (timestamp)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_conversations_session
+        ON conversations (session_id, created_at DESC, id, subject)
+        '''
+    ],
+    # 3: per-conversation counters kept current by triggers
+    [
+        '''
+        ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0
+        ''',
+        '''
+        ALTER TABLE conversations ADD COLUMN evaluation_count INTEGER NOT NULL DEFAULT 0
+        ''',
+        '''
+        UPDATE conversations SET
+            message_count = (
+                SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id
+            ),
+            evaluation_count = (
+                SELECT COUNT(*) FROM messages
+                WHERE messages.conversation_id = conversations.id
+                AND messages.message_type = 'evaluation_question'
+            )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_count_insert AFTER INSERT ON messages
+        BEGIN
+            UPDATE conversations SET
+                message_count = message_count + 1,
+                evaluation_count = evaluation_count + (NEW.message_type = 'evaluation_question')
+            WHERE id = NEW.conversation_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_count_delete AFTER DELETE ON messages
+        BEGIN
+            UPDATE conversations SET
+                message_count = message_count - 1,
+                evaluation_count = evaluation_count - (OLD.message_type = 'evaluation_question')
+            WHERE id = OLD.conversation_id;
+        END
+        '''
+    ],
+    # 4: pre-generated tutorials, tagged with the prompt/model version that produced them
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS prewarmed_tutorials (
+            subject TEXT PRIMARY KEY,
+            version TEXT NOT NULL,
+            content TEXT NOT NULL,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        '''
+    ],
+    # 5: rolling summary of each conversation's older turns, up to and including through_message_id
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            conversation_id INTEGER PRIMARY KEY,
+            summary TEXT NOT NULL,
+            through_message_id INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+        )
+        '''
+    ],
+    # 6: full-text index over message content, kept in sync by triggers and backfilled from existing messages
+    [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+            content,
+            content = 'messages',
+            content_rowid = 'id',
+            tokenize = 'porter unicode61'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (NEW.id, NEW.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (NEW.id, NEW.content);
+        END
+        ''',
+        '''
+        INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')
+        '''
+    ],
+    # 7: session index ordered like the paginated session list, newest first with id breaking ties
+    [
+        '''
+        DROP INDEX IF EXISTS idx_conversations_session
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_conversations_session
+        ON conversations (session_id, created_at DESC, id DESC, subject)
+        '''
+    ],
+    # 8: token counts and latency of every LLM call, by conversation and graph node
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id INTEGER,
+            node TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            latency_ms REAL NOT NULL,
+            cached INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_llm_calls_conversation
+        ON llm_calls (conversation_id, node)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_llm_calls_created
+        ON llm_calls (created_at)
+        '''
+    ]
+]
+
+# SQL expressions get_llm_usage can group LLM calls by
+USAGE_GROUPS = {
+    "session": "c.session_id",
+    "subject": "c.subject",
+    "conversation": "u.conversation_id",
+    "node": "u.node",
+    "day": "date(u.created_at)"
+}
+
+MESSAGE_COLUMNS = "id, role, content, message_type, timestamp"
+
+# Messages and LLM call records queued together for the background writer
+WriteBatch = Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]
+
+def _match_expression(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching every word.
+    
+    Each word is quoted, so punctuation and FTS5 operators typed by the user
+    are matched literally instead of raising a syntax error. Words are not
+    prefix-matched: a short prefix expands to every term it starts, which
+    makes the query orders of magnitude slower on a large index.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    
+    return " ".join(f'"{word}"' for word in words)
+
+def _message_from_row(row: tuple) -> Dict[str, Any]:
+    """Convert a row selected with MESSAGE_COLUMNS into a message dict."""
+    return {
+        "id": row[0],
+        "role": row[1],
+        "content": row[2],
+        "message_type": row[3],
+        "timestamp": row[4]
+    }
+
+class UnitOfWork:
+    """Messages and LLM call records collected in memory and written to the database in one transaction."""
+    
+    def __init__(self, db: "TutorialDatabase"):
+        self.db = db
+        self.messages: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+    
+    def add_message(self, conversation_id: int, role: str, content: str, message_type: str = "chat"):
+        """Queue a message to be written when the unit of work commits."""
+        self.messages.append({
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "message_type": message_type
+        })
+    
+    def add_llm_calls(self, calls: List[Dict[str, Any]]):
+        """Queue LLM call records (see TutorialDatabase.record_llm_calls) to be written with the messages."""
+        self.llm_calls.extend(calls)
+    
+    @timed("db_query_seconds")
+    def commit(self):
+        """Write every queued message and LLM call record in a single transaction."""
+        if self.messages or self.llm_calls:
+            self.db._write_rows(self.messages, self.llm_calls)
+            self.messages = []
+            self.llm_calls = []
 
 class TutorialDatabase:
     """Simple SQLite database for storing tutorial conversations."""
     
-    def __init__(self, db_path: str = "database/tutorial_agent.db"):
+    def __init__(
+        self,
+        db_path: str = "database/tutorial_agent.db",
+        pool_size: int = DATABASE_POOL_SIZE,
+        write_behind: bool = DATABASE_WRITE_BEHIND
+    ):
         self.db_path = db_path
+        self.pool_size = pool_size
+        
+        # Bounded pool of open connections shared by all threads
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
+        self._pool_lock = threading.Lock()
+        self._opened = 0
+        
+        # session_id -> {(cursor, limit): page} for the sessions listed most
+        # recently; a session's entry is dropped whenever it gains a conversation
+        self._session_pages: "OrderedDict[str, Dict[tuple, Dict[str, Any]]]" = OrderedDict()
+        self._session_pages_lock = threading.Lock()
+        self._session_pages_generation = 0
+        
         self.init_database()
+        
+        # Write-behind mode hands message inserts to a background writer
+        self.write_behind = write_behind
+        self._writer: Optional[threading.Thread] = None
+        if write_behind:
+            self._start_writer()
     
-    def init_database(self):
-        """Initialize the database with required tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create conversations table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                subject TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create messages table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id INTEGER,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                message_type TEXT DEFAULT 'chat',
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection with the tuned pragmas applied."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DATABASE_BUSY_TIMEOUT,
+            check_same_thread=False
+        )
+        
+        # WAL lets readers proceed while a writer commits, and NORMAL
+        # synchronous only fsyncs at checkpoints instead of every commit
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={DATABASE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size=-{DATABASE_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        
+        return conn
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """Take a connection from the pool, opening one if the pool is not full."""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            if self._opened < self.pool_size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        
+        # Pool is exhausted, wait for another thread to hand one back
+        return self._pool.get(timeout=DATABASE_BUSY_TIMEOUT)
+    
+    def _release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding any open transaction."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._pool.put_nowait(conn)
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection for the duration of the block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+    
+    def _start_writer(self):
+        """Start the background thread that group-commits queued messages and LLM call records."""
+        self._write_queue: "queue.Queue[Optional[WriteBatch]]" = queue.Queue(maxsize=DATABASE_WRITE_QUEUE_SIZE)
+        
+        # Number of queued-but-unwritten batches per conversation, so reads
+        # can wait for their own conversation's writes to land
+        self._pending: Dict[int, int] = {}
+        self._pending_cond = threading.Condition()
+        
+        self._writer = threading.Thread(target=self._write_loop, name="tutorial-db-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+    
+    def _enqueue_rows(self, messages: List[Dict[str, Any]], llm_calls: List[Dict[str, Any]]):
+        """Queue a batch for the writer, blocking while the queue is full."""
+        with self._pending_cond:
+            for conversation_id in {msg["conversation_id"] for msg in messages}:
+                self._pending[conversation_id] = self._pending.get(conversation_id, 0) + 1
+        
+        self._write_queue.put((messages, llm_calls))
+    
+    def _write_loop(self):
+        """Drain the write queue, coalescing waiting batches into one commit."""
+        stopping = False
+        while not stopping:
+            batches = [self._write_queue.get()]
+            size = sum(len(rows) for rows in batches[0] or ())
+            
+            while size < DATABASE_WRITE_BATCH_SIZE:
+                try:
+                    batch = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                batches.append(batch)
+                size += sum(len(rows) for rows in batch or ())
+            
+            # A None batch is the shutdown sentinel
+            if None in batches:
+                stopping = True
+            batches_to_write = [batch for batch in batches if batch is not None]
+            
+            try:
+                self._write_batches(batches_to_write)
+            finally:
+                with self._pending_cond:
+                    for messages, _ in batches_to_write:
+                        for conversation_id in {msg["conversation_id"] for msg in messages}:
+                            self._pending[conversation_id] -= 1
+                            if not self._pending[conversation_id]:
+                                del self._pending[conversation_id]
+                    self._pending_cond.notify_all()
+                
+                for _ in batches:
+                    self._write_queue.task_done()
+    
+    @timed("db_query_seconds", function="write_batches")
+    def _write_batches(self, batches: List["WriteBatch"]):
+        """Write several batches in one transaction, isolating failures per batch."""
+        self._insert_batches(batches)
+    
+    def _insert_batches(self, batches: List["WriteBatch"]):
+        """Body of _write_batches, which calls itself without opening another span on retries."""
+        if not batches:
+            return
+        
+        try:
+            self._insert_rows(
+                [msg for messages, _ in batches for msg in messages],
+                [call for _, llm_calls in batches for call in llm_calls]
             )
-        ''')
+            return
+        except Exception:
+            if len(batches) == 1:
+                messages, llm_calls = batches[0]
+                logger.exception(
+                    "Dropping %d queued message(s) and %d LLM call record(s) that could not be saved",
+                    len(messages), len(llm_calls)
+                )
+                return
+        
+        # Retry one batch at a time so a bad batch doesn't take others with it
+        for batch in batches:
+            self._insert_batches([batch])
+    
+    def _wait_for_writes(self, conversation_id: int):
+        """Block until every queued write for the conversation has been committed."""
+        if not self._writer:
+            return
         
-        conn.commit()
-        conn.close()
+        with self._pending_cond:
+            self._pending_cond.wait_for(lambda: conversation_id not in self._pending)
+    
+    @timed("db_query_seconds")
+    def flush(self):
+        """Block until every queued write has been committed."""
+        self._join_writes()
+    
+    def _join_writes(self):
+        """Untimed body of flush, for timed methods that need their queued writes committed."""
+        if self._writer:
+            self._write_queue.join()
+    
+    def close(self):
+        """Flush pending writes, stop the writer and close every idle pooled connection."""
+        if self._writer:
+            self.write_behind = False
+            writer, self._writer = self._writer, None
+            self._write_queue.put(None)
+            writer.join()
+            atexit.unregister(self.close)
+        
+        with self._pool_lock:
+            while True:
+                try:
+                    conn = self._pool.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._opened -= 1
+    
+    def init_database(self):
+        """Initialize the database and bring its schema up to date."""
+        with self.connection() as conn:
+            self._migrate(conn)
     
+    def _migrate(self, conn: sqlite3.Connection):
+        """Apply every migration newer than the database's user_version."""
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if current_version >= len(MIGRATIONS):
+            return
+        
+        for version, statements in enumerate(MIGRATIONS, start=1):
+            # Each migration and its version bump commit atomically; taking the
+            # write lock before re-reading the version keeps concurrent
+            # processes from applying the same migration twice
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+    
+    def schema_version(self) -> int:
+        """Return the schema version the database is currently at."""
+        with self.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    @timed("db_query_seconds")
     def create_conversation(self, session_id: str, subject: str) -> int:
         """Create a new conversation and return its ID."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.connection() as conn, conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO conversations (session_id, subject)
+                VALUES (?, ?)
+            ''', (session_id, subject))
+            
+            conversation_id = cursor.lastrowid
         
-        cursor.execute('''
-            INSERT INTO conversations (session_id, subject)
-            VALUES (?, ?)
-        ''', (session_id, subject))
+        self._invalidate_session_pages([session_id])
+        return conversation_id
+    
+    @timed("db_query_seconds")
+    def create_tutorial_conversations(self, conversations: List[Tuple[str, str, str]]) -> List[int]:
+        """Create conversations from (session_id, subject, tutorial) tuples in one transaction.
         
-        conversation_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        Each conversation gets its tutorial as the first message. Returns the
+        new conversation IDs in the order given.
+        """
+        with self.connection() as conn, conn:
+            cursor = conn.cursor()
+            
+            conversation_ids = []
+            for session_id, subject, _ in conversations:
+                cursor.execute('''
+                    INSERT INTO conversations (session_id, subject)
+                    VALUES (?, ?)
+                ''', (session_id, subject))
+                conversation_ids.append(cursor.lastrowid)
+            
+            cursor.executemany('''
+                INSERT INTO messages (conversation_id, role, content, message_type)
+                VALUES (?, 'assistant', ?, 'tutorial')
+            ''', [
+                (conversation_id, tutorial)
+                for conversation_id, (_, _, tutorial) in zip(conversation_ids, conversations)
+            ])
         
-        return conversation_id
+        self._invalidate_session_pages({session_id for session_id, _, _ in conversations})
+        return conversation_ids
     
+    @timed("db_query_seconds")
     def add_message(self, conversation_id: int, role: str, content: str, message_type: str = "chat"):
         """Add a message to the conversation."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self._write_rows([{
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "message_type": message_type
+        }], [])
+    
+    @timed("db_query_seconds")
+    def add_messages(self, messages: List[Dict[str, Any]], llm_calls: Optional[List[Dict[str, Any]]] = None):
+        """Add many messages, and the LLM calls that produced them, in a single transaction; either all are stored or none."""
+        self._write_rows(messages, llm_calls or [])
+    
+    def _write_rows(self, messages: List[Dict[str, Any]], llm_calls: List[Dict[str, Any]]):
+        """Hand rows to the background writer, or insert them now without write-behind."""
+        if not messages and not llm_calls:
+            return
         
-        cursor.execute('''
-            INSERT INTO messages (conversation_id, role, content, message_type)
-            VALUES (?, ?, ?, ?)
-        ''', (conversation_id, role, content, message_type))
+        if self.write_behind:
+            self._enqueue_rows(messages, llm_calls)
+        else:
+            self._insert_rows(messages, llm_calls)
+    
+    def _insert_rows(self, messages: List[Dict[str, Any]], llm_calls: List[Dict[str, Any]]):
+        """Insert messages and LLM call records synchronously in one transaction."""
+        with self.connection() as conn, conn:
+            conn.executemany('''
+                INSERT INTO messages (conversation_id, role, content, message_type)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (msg["conversation_id"], msg["role"], msg["content"], msg.get("message_type", "chat"))
+                for msg in messages
+            ])
+            conn.executemany('''
+                INSERT INTO llm_calls (conversation_id, node, model, prompt_tokens, completion_tokens, latency_ms, cached, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    call["conversation_id"], call["node"], call["model"], call.get("prompt_tokens"),
+                    call.get("completion_tokens"), call["latency_ms"], bool(call.get("cached")), call.get("error")
+                )
+                for call in llm_calls
+            ])
+    
+    @contextmanager
+    def unit_of_work(self) -> Iterator[UnitOfWork]:
+        """Collect messages for the block and commit them together on success."""
+        uow = UnitOfWork(self)
+        yield uow
+        uow.commit()
+    
+    @timed("db_query_seconds")
+    def get_conversation(self, conversation_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single conversation, or None if it does not exist."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, session_id, subject, created_at
+                FROM conversations
+                WHERE id = ?
+            ''', (conversation_id,))
+            row = cursor.fetchone()
+        
+        if not row:
+            return None
         
-        conn.commit()
-        conn.close()
+        return {
+            "id": row[0],
+            "session_id": row[1],
+            "subject": row[2],
+            "created_at": row[3]
+        }
     
+    @timed("db_query_seconds")
     def get_conversation_history(self, conversation_id: int) -> List[Dict[str, Any]]:
         """Get all messages for a conversation."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self._wait_for_writes(conversation_id)
         
-        cursor.execute('''
-            SELECT role, content, message_type, timestamp
-            FROM messages
-            WHERE conversation_id = ?
-            ORDER BY timestamp ASC
-        ''', (conversation_id,))
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT role, content, message_type, timestamp
+                FROM messages
+                WHERE conversation_id = ?
+                ORDER BY id ASC
+            ''', (conversation_id,))
+            rows = cursor.fetchall()
         
         messages = []
-        for row in cursor.fetchall():
+        for row in rows:
             messages.append({
                 "role": row[0],
                 "content": row[1],
@@ -91,28 +636,418 @@ class TutorialDatabase:
                 "timestamp": row[3]
             })
         
-        conn.close()
         return messages
     
+    @timed("db_query_seconds")
+    def get_messages_page(self, conversation_id: int, before_id: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get up to `limit` messages older than `before_id` (newest when None), oldest first."""
+        self._wait_for_writes(conversation_id)
+        
+        # Without a cursor, start from the newest message (largest possible rowid)
+        if before_id is None:
+            before_id = 2 ** 63 - 1
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM messages
+                WHERE conversation_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (conversation_id, before_id, limit))
+            rows = cursor.fetchall()
+        
+        return [_message_from_row(row) for row in reversed(rows)]
+    
+    def iter_conversation_history(self, conversation_id: int, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield a conversation's messages oldest first, fetching `batch_size` rows at a time."""
+        self._wait_for_writes(conversation_id)
+        
+        after_id = 0
+        while True:
+            rows = self._history_batch(conversation_id, after_id, batch_size)
+            
+            for row in rows:
+                yield _message_from_row(row)
+            
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+    
+    # Timed per batch rather than around the generator, which would include the consumer's time
+    @timed("db_query_seconds", function="iter_conversation_history")
+    def _history_batch(self, conversation_id: int, after_id: int, batch_size: int) -> List[tuple]:
+        """Fetch the next batch of a conversation's message rows after `after_id`."""
+        # Each batch borrows its own connection so a slow consumer doesn't hold one
+        with self.connection() as conn:
+            return conn.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM messages
+                WHERE conversation_id = ? AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (conversation_id, after_id, batch_size)).fetchall()
+    
+    @timed("db_query_seconds")
+    def get_conversation_tail(self, conversation_id: int, limit: int) -> Optional[Dict[str, Any]]:
+        """Get a conversation's last `limit` messages plus its metadata and rolling summary, or None if it does not exist."""
+        self._wait_for_writes(conversation_id)
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT c.id, c.session_id, c.subject, c.created_at, c.message_count, c.evaluation_count, s.summary
+                FROM conversations c
+                LEFT JOIN conversation_summaries s ON s.conversation_id = c.id
+                WHERE c.id = ?
+            ''', (conversation_id,))
+            conversation = cursor.fetchone()
+            
+            if not conversation:
+                return None
+            
+            cursor.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM messages
+                WHERE conversation_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (conversation_id, limit))
+            rows = cursor.fetchall()
+        
+        messages = [_message_from_row(row) for row in reversed(rows)]
+        
+        return {
+            "id": conversation[0],
+            "session_id": conversation[1],
+            "subject": conversation[2],
+            "created_at": conversation[3],
+            "message_count": conversation[4],
+            "evaluation_count": conversation[5],
+            "summary": conversation[6],
+            "last_message_type": messages[-1]["message_type"] if messages else None,
+            "has_more": conversation[4] > len(messages),
+            "messages": messages
+        }
+    
+    @timed("db_query_seconds")
+    def get_first_message(self, conversation_id: int, message_type: str) -> Optional[Dict[str, Any]]:
+        """Get the earliest message of a given type in a conversation."""
+        self._wait_for_writes(conversation_id)
+        
+        with self.connection() as conn:
+            row = conn.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM messages
+                WHERE conversation_id = ? AND message_type = ?
+                ORDER BY id ASC
+                LIMIT 1
+            ''', (conversation_id, message_type)).fetchone()
+        
+        return _message_from_row(row) if row else None
+    
+    @timed("db_query_seconds")
+    def get_summary(self, conversation_id: int) -> Optional[Dict[str, Any]]:
+        """Get a conversation's rolling summary and the last message it covers."""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT summary, through_message_id, updated_at
+                FROM conversation_summaries
+                WHERE conversation_id = ?
+            ''', (conversation_id,)).fetchone()
+        
+        if not row:
+            return None
+        
+        return {
+            "summary": row[0],
+            "through_message_id": row[1],
+            "updated_at": row[2]
+        }
+    
+    @timed("db_query_seconds")
+    def save_summary(self, conversation_id: int, summary: str, through_message_id: int):
+        """Store a conversation's rolling summary unless a newer one is already stored."""
+        with self.connection() as conn, conn:
+            conn.execute('''
+                INSERT INTO conversation_summaries (conversation_id, summary, through_message_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (conversation_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    through_message_id = excluded.through_message_id,
+                    updated_at = excluded.updated_at
+                WHERE excluded.through_message_id > conversation_summaries.through_message_id
+            ''', (conversation_id, summary, through_message_id))
+    
+    @timed("db_query_seconds")
+    def get_messages_to_summarize(self, conversation_id: int, after_id: int, keep_recent: int, limit: int) -> List[Dict[str, Any]]:
+        """Get up to `limit` messages after `after_id` that are older than the last `keep_recent`, excluding the tutorial."""
+        self._wait_for_writes(conversation_id)
+        
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM messages
+                WHERE conversation_id = ? AND id > ? AND message_type != 'tutorial'
+                    AND id < (
+                        SELECT MIN(id) FROM (
+                            SELECT id FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT ?
+                        )
+                    )
+                ORDER BY id
+                LIMIT ?
+            ''', (conversation_id, after_id, conversation_id, keep_recent, limit)).fetchall()
+        
+        return [_message_from_row(row) for row in rows]
+    
+    @timed("db_query_seconds")
+    def search(self, query: str, session_id: Optional[str] = None, limit: int = 20, candidates: int = SEARCH_MAX_CANDIDATES) -> List[Dict[str, Any]]:
+        """Find messages containing every word of the query, best BM25 match first.
+        
+        Restricted to one session's conversations when `session_id` is given.
+        Only the most recent `candidates` matches are ranked, so a query for a
+        common word costs the same however large the corpus grows. Each result
+        carries a snippet of the message with the matches in bold.
+        """
+        expression = _match_expression(query)
+        if expression is None:
+            return []
+        
+        with self.connection() as conn:
+            session_filter, params = "", (expression,)
+            if session_id is not None:
+                # Bounding the rowids to the session's span lets FTS5 skip
+                # every match outside it instead of joining and discarding them
+                first_id, last_id = conn.execute('''
+                    SELECT MIN(m.id), MAX(m.id)
+                    FROM conversations c
+                    JOIN messages m ON m.conversation_id = c.id
+                    WHERE c.session_id = ?
+                ''', (session_id,)).fetchone()
+                if first_id is None:
+                    return []
+                
+                session_filter = "AND messages_fts.rowid BETWEEN ? AND ? AND c.session_id = ?"
+                params = (expression, first_id, last_id, session_id)
+            
+            # FTS5 walks the matches newest first and stops after `candidates`;
+            # only those are scored and sorted
+            rows = conn.execute(f'''
+                SELECT * FROM (
+                    SELECT m.id, m.conversation_id, c.session_id, c.subject, m.role, m.message_type, m.timestamp,
+                        snippet(messages_fts, 0, '**', '**', '…', 16), bm25(messages_fts) AS score
+                    FROM messages_fts
+                    JOIN messages m ON m.id = messages_fts.rowid
+                    JOIN conversations c ON c.id = m.conversation_id
+                    WHERE messages_fts MATCH ? {session_filter}
+                    ORDER BY messages_fts.rowid DESC
+                    LIMIT ?
+                )
+                ORDER BY score
+                LIMIT ?
+            ''', params + (candidates, limit)).fetchall()
+        
+        return [
+            {
+                "message_id": row[0],
+                "conversation_id": row[1],
+                "session_id": row[2],
+                "subject": row[3],
+                "role": row[4],
+                "message_type": row[5],
+                "timestamp": row[6],
+                "snippet": row[7],
+                "score": row[8]
+            }
+            for row in rows
+        ]
+    
+    @timed("db_query_seconds")
+    def get_prewarmed_tutorial(self, subject: str, version: str, max_age: float) -> Optional[str]:
+        """Get a pre-generated tutorial if one exists for this version and is newer than `max_age` seconds."""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT content
+                FROM prewarmed_tutorials
+                WHERE subject = ? AND version = ? AND generated_at >= datetime('now', ?)
+            ''', (subject.strip().lower(), version, f"-{int(max_age)} seconds")).fetchone()
+        
+        return row[0] if row else None
+    
+    @timed("db_query_seconds")
+    def save_prewarmed_tutorial(self, subject: str, version: str, content: str):
+        """Store or replace the pre-generated tutorial for a subject."""
+        with self.connection() as conn, conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO prewarmed_tutorials (subject, version, content, generated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (subject.strip().lower(), version, content))
+    
+    @timed("db_query_seconds")
+    def record_llm_calls(self, calls: List[Dict[str, Any]]):
+        """Record LLM calls in one transaction.
+        
+        Each call has its conversation_id (None outside a conversation), the
+        graph node or task that made it, the model, prompt_tokens and
+        completion_tokens (None when not reported), latency_ms, whether it was
+        a cache hit, and the error it failed with, if any. Calls made during a
+        turn belong in its UnitOfWork instead, so they share the turn's commit.
+        """
+        self._write_rows([], calls)
+    
+    @timed("db_query_seconds")
+    def get_llm_usage(
+        self,
+        group_by: str = "session",
+        days: Optional[float] = None,
+        session_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Aggregate recorded LLM calls by session, subject, conversation, node or day.
+        
+        Each group has its call, cache hit and error counts, prompt and
+        completion token totals, mean and max latency, and the cost at
+        LLM_PROMPT_COST_PER_MTOK / LLM_COMPLETION_COST_PER_MTOK. Calls made
+        outside a conversation (pre-warming) group under None. Groups are
+        ordered by cost, most expensive first, except days, which are newest
+        first. `days` only counts calls from that many recent days.
+        """
+        if group_by not in USAGE_GROUPS:
+            raise ValueError(f"Unknown usage grouping: {group_by}. Use one of: {', '.join(USAGE_GROUPS)}.")
+        
+        # Call records may still be queued for the background writer
+        self._join_writes()
+        
+        filters, params = [], [LLM_PROMPT_COST_PER_MTOK / 1e6, LLM_COMPLETION_COST_PER_MTOK / 1e6]
+        if days is not None:
+            filters.append("u.created_at >= datetime('now', ?)")
+            params.append(f"-{float(days)} days")
+        if session_id is not None:
+            filters.append("c.session_id = ?")
+            params.append(session_id)
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        order = "key DESC" if group_by == "day" else "cost DESC, key"
+        params.append(limit if limit is not None else -1)
+        
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {USAGE_GROUPS[group_by]} AS key, COUNT(*), SUM(u.cached), COUNT(u.error),
+                    COALESCE(SUM(u.prompt_tokens), 0) AS prompt, COALESCE(SUM(u.completion_tokens), 0) AS completion,
+                    AVG(u.latency_ms), MAX(u.latency_ms),
+                    COALESCE(SUM(u.prompt_tokens), 0) * ? + COALESCE(SUM(u.completion_tokens), 0) * ? AS cost
+                FROM llm_calls u
+                LEFT JOIN conversations c ON c.id = u.conversation_id
+                {where}
+                GROUP BY key
+                ORDER BY {order}
+                LIMIT ?
+            ''', params).fetchall()
+        
+        return [
+            {
+                "key": row[0],
+                "calls": row[1],
+                "cached": row[2],
+                "errors": row[3],
+                "prompt_tokens": row[4],
+                "completion_tokens": row[5],
+                "mean_latency_ms": row[6],
+                "max_latency_ms": row[7],
+                "cost": row[8]
+            }
+            for row in rows
+        ]
+    
+    @timed("db_query_seconds")
+    def get_session_page(self, session_id: str, before: Optional[Tuple[str, int]] = None, limit: int = SESSION_LIST_PAGE_SIZE) -> Dict[str, Any]:
+        """Get one page of a session's conversations, newest first.
+        
+        Pages are keyset-paginated: pass the previous page's "next" cursor as
+        `before` to get the page after it, so every page costs one index range
+        scan however long the session's history is. Each conversation has a
+        subject preview, its message count and creation time. Pages are cached
+        until the session's next create_conversation, so message counts can
+        lag behind until then.
+        """
+        key = (tuple(before) if before else None, limit)
+        
+        with self._session_pages_lock:
+            pages = self._session_pages.get(session_id)
+            if pages is not None and key in pages:
+                self._session_pages.move_to_end(session_id)
+                return pages[key]
+            generation = self._session_pages_generation
+        
+        if before:
+            cursor_filter, params = "AND (created_at, id) < (?, ?)", (session_id, before[0], before[1], limit + 1)
+        else:
+            cursor_filter, params = "", (session_id, limit + 1)
+        
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT id, substr(subject, 1, {int(SESSION_LIST_PREVIEW_CHARS)}), length(subject) > {int(SESSION_LIST_PREVIEW_CHARS)},
+                    message_count, created_at
+                FROM conversations
+                WHERE session_id = ? {cursor_filter}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', params).fetchall()
+        
+        # The extra row only tells whether another page follows
+        conversations = [
+            {
+                "id": row[0],
+                "subject": row[1] + ("…" if row[2] else ""),
+                "message_count": row[3],
+                "created_at": row[4]
+            }
+            for row in rows[:limit]
+        ]
+        page = {
+            "conversations": conversations,
+            "next": (rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+        }
+        
+        with self._session_pages_lock:
+            # A conversation created while the page was read makes it stale
+            if generation == self._session_pages_generation:
+                self._session_pages.setdefault(session_id, {})[key] = page
+                self._session_pages.move_to_end(session_id)
+                while len(self._session_pages) > SESSION_LIST_CACHE_SIZE:
+                    self._session_pages.popitem(last=False)
+        
+        return page
+    
+    def _invalidate_session_pages(self, session_ids):
+        """Drop the cached session list pages of sessions that gained conversations."""
+        with self._session_pages_lock:
+            self._session_pages_generation += 1
+            for session_id in session_ids:
+                self._session_pages.pop(session_id, None)
+    
+    @timed("db_query_seconds")
     def get_conversations_by_session(self, session_id: str) -> List[Dict[str, Any]]:
         """Get all conversations for a session."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, subject, created_at
-            FROM conversations
-            WHERE session_id = ?
-            ORDER BY created_at DESC
-        ''', (session_id,))
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, subject, created_at
+                FROM conversations
+                WHERE session_id = ?
+                ORDER BY created_at DESC
+            ''', (session_id,))
+            rows = cursor.fetchall()
         
         conversations = []
-        for row in cursor.fetchall():
+        for row in rows:
             conversations.append({
                 "id": row[0],
                 "subject": row[1],
                 "created_at": row[2]
             })
         
-        conn.close()
-        return conversations 
\ No newline at end of file
+        return conversations
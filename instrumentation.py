@@ -0,0 +1,355 @@
+"""
+Timing spans, in-process latency histograms and structured logging.
+
+`timed` wraps a function, coroutine function or generator function in a span
+that records its wall time under a metric name and labels; the node, LLM and
+database layers are decorated with it. Generators are timed only while they
+produce items, so a slow consumer such as the UI does not inflate the span. Each series keeps a count, a sum, an
+error count and a window of recent durations for p50/p95/p99. Components
+with their own counters, such as the response cache, register a collector
+whose values are exported as gauges. The registry can be exported as JSON or Prometheus text, served on a local HTTP port or
+written to a file at exit.
+"""
+import atexit
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from config import (
+    ENABLE_LOGGING, LOG_LEVEL, LOG_FILE, METRICS_ENABLED, METRICS_WINDOW, METRICS_PORT, METRICS_EXPORT_FILE
+)
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+class _Series:
+    """Durations recorded for one metric and label set."""
+    
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: deque = deque(maxlen=window)
+    
+    def observe(self, seconds: float, error: bool):
+        self.count += 1
+        self.errors += error
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+    
+    def quantiles(self) -> Dict[float, float]:
+        """Return the nearest-rank quantiles of the recent window."""
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+class Metrics:
+    """Registry of span timings and counters, safe to share between threads."""
+    
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self.started = time.time()
+        self._series: Dict[str, Dict[LabelSet, _Series]] = {}
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, name: str, seconds: float, error: bool = False, **labels):
+        """Record one duration in seconds."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._series.setdefault(name, {}).get(key)
+            if series is None:
+                series = self._series[name][key] = _Series(self.window)
+            series.observe(seconds, error)
+    
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add to a counter."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            counters = self._counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + value
+    
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]]):
+        """Export the numbers collect() returns as gauges named `<name>_<key>`, read at each export."""
+        with self._lock:
+            self._collectors[name] = collect
+    
+    def _gauges(self) -> Dict[str, float]:
+        """Read every collector, outside the lock; a failing collector is logged and skipped."""
+        with self._lock:
+            collectors = list(self._collectors.items())
+        
+        gauges = {}
+        for name, collect in collectors:
+            try:
+                values = collect()
+            except Exception:
+                logger.exception("Metrics collector %s failed", name)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[f"{name}_{key}"] = float(value)
+        return gauges
+    
+    @contextmanager
+    def span(self, name: str, log_level: int = logging.DEBUG, **labels) -> Iterator[None]:
+        """Time the block, recording it as failed if it raises."""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._finish_span(name, time.perf_counter() - started, error, log_level, labels)
+    
+    def time_iterator(self, name: str, iterable: Iterable, log_level: int = logging.DEBUG, **labels) -> Iterator:
+        """Yield from the iterable, timing only the calls that produce its items.
+        
+        Time the consumer spends between items is left out. The wait for the
+        first item is also recorded, as `<name>_first_chunk_seconds` with the
+        "_seconds" suffix of `name` dropped first.
+        """
+        first_chunk_name = f"{name.removesuffix('_seconds')}_first_chunk_seconds"
+        iterator = iter(iterable)
+        busy, error, first = 0.0, False, True
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    busy += time.perf_counter() - started
+                
+                if first:
+                    first = False
+                    self.observe(first_chunk_name, busy, **labels)
+                yield item
+        finally:
+            # A consumer that stops early closes the source too, so its cleanup runs now
+            started = time.perf_counter()
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            busy += time.perf_counter() - started
+            self._finish_span(name, busy, error, log_level, labels)
+    
+    def _finish_span(self, name: str, seconds: float, error: bool, log_level: int, labels: Dict[str, Any]):
+        """Record a finished span and log it at log_level."""
+        self.observe(name, seconds, error, **labels)
+        if logger.isEnabledFor(log_level):
+            logger.log(log_level, name, extra={"span": name, "duration_ms": round(seconds * 1000, 3), "error": error, **labels})
+    
+    def reset(self):
+        """Forget every recorded series and counter."""
+        with self._lock:
+            self._series.clear()
+            self._counters.clear()
+            self.started = time.time()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return every series, counter and gauge as plain data, durations in milliseconds."""
+        gauges = self._gauges()
+        with self._lock:
+            uptime = time.time() - self.started
+            spans = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": series.count,
+                        "errors": series.errors,
+                        "per_second": series.count / uptime if uptime else 0.0,
+                        "mean_ms": series.total / series.count * 1000 if series.count else 0.0,
+                        **{f"p{int(q * 100)}_ms": value * 1000 for q, value in series.quantiles().items()},
+                        "max_ms": series.max * 1000
+                    }
+                    for key, series in by_labels.items()
+                ]
+                for name, by_labels in self._series.items()
+            }
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in by_labels.items()]
+                for name, by_labels in self._counters.items()
+            }
+        return {"uptime_seconds": uptime, "spans": spans, "counters": counters, "gauges": gauges}
+    
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+    
+    def to_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format.
+        
+        Spans become summaries over the recent window (plus an error counter);
+        counters and collector gauges are exported as they are.
+        """
+        def labels_text(key: LabelSet, **extra) -> str:
+            pairs = list(key) + [(k, str(v)) for k, v in extra.items()]
+            if not pairs:
+                return ""
+            escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+        
+        gauges = self._gauges()
+        lines = []
+        with self._lock:
+            for name, by_labels in sorted(self._series.items()):
+                lines.append(f"# TYPE {name} summary")
+                for key, series in by_labels.items():
+                    for q, value in series.quantiles().items():
+                        lines.append(f"{name}{labels_text(key, quantile=q)} {value:.6f}")
+                    lines.append(f"{name}_sum{labels_text(key)} {series.total:.6f}")
+                    lines.append(f"{name}_count{labels_text(key)} {series.count}")
+                lines.append(f"# TYPE {name}_errors_total counter")
+                for key, series in by_labels.items():
+                    lines.append(f"{name}_errors_total{labels_text(key)} {series.errors}")
+            
+            for name, by_labels in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in by_labels.items():
+                    lines.append(f"{name}{labels_text(key)} {value}")
+        
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+    
+    def write(self, path: str):
+        """Write the registry to a file, as Prometheus text for .prom files and JSON otherwise."""
+        with open(path, "w") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+metrics = Metrics()
+
+def timed(name: str, log_level: int = logging.DEBUG, **labels) -> Callable:
+    """Decorate a function so each call is recorded as a span.
+
+    Without explicit labels the function's name is used as the "function"
+    label. Coroutine functions are timed until they return. Generator functions
+    are timed as by Metrics.time_iterator: only while producing items, with the
+    wait for the first item recorded separately. With METRICS_ENABLED off the
+    function is returned unchanged.
+    """
+    def decorate(fn: Callable) -> Callable:
+        if not METRICS_ENABLED:
+            return fn
+        span_labels = labels or {"function": fn.__name__}
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with metrics.span(name, log_level, **span_labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                yield from metrics.time_iterator(name, fn(*args, **kwargs), log_level, **span_labels)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name, log_level, **span_labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object, including any extra fields."""
+    
+    # Attributes every LogRecord has; anything else was passed as `extra`
+    _standard = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in self._standard})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_logging_configured = False
+_logging_lock = threading.Lock()
+
+def configure_logging(enabled: bool = ENABLE_LOGGING, level: str = LOG_LEVEL, path: Optional[str] = LOG_FILE):
+    """Send log records to LOG_FILE (or stderr without one) as JSON lines; only the first call has an effect."""
+    global _logging_configured
+    with _logging_lock:
+        if _logging_configured or not enabled:
+            return
+        _logging_configured = True
+
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.addHandler(handler)
+
+    # A mistyped LOG_LEVEL shouldn't stop the app from starting
+    try:
+        root.setLevel(level.upper())
+    except ValueError:
+        root.setLevel(logging.INFO)
+        logger.warning("Unknown LOG_LEVEL %r, logging at INFO instead", level)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics as Prometheus text and /metrics.json as JSON."""
+    
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = metrics.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve the metrics on a local port from a daemon thread; port 0 disables it."""
+    if not port:
+        return None
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return server
+
+def _export_at_exit():
+    if METRICS_EXPORT_FILE:
+        metrics.write(METRICS_EXPORT_FILE)
+
+atexit.register(_export_at_exit)
@@ -0,0 +1,210 @@
+"""
+LLM backends: the Gemini API and a local fake for offline runs and load tests.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from config import (
+    FAKE_LLM_LATENCY_MS, FAKE_LLM_LATENCY_DISTRIBUTION, FAKE_LLM_LATENCY_SIGMA, FAKE_LLM_ERROR_RATE,
+    FAKE_LLM_ERROR_CODE, FAKE_LLM_STREAM_CHUNKS, FAKE_LLM_RESPONSE_WORDS, FAKE_LLM_SEED, LLM_TEMPERATURE
+)
+
+class LLMBackend:
+    """Interface every backend implements; timeouts are in seconds and optional.
+
+    When a `usage` dict is passed, the backend fills in the call's
+    "prompt_tokens" and "completion_tokens" once they are known.
+    """
+
+    # Identify the backend's responses in cache keys
+    model_name = ""
+    temperature = LLM_TEMPERATURE
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> str:
+        """Return the full response text for a prompt, raising on failure."""
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """Yield the response text in chunks as it is generated."""
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> str:
+        """Async variant of generate; runs generate on a worker thread unless overridden."""
+        return await asyncio.to_thread(self.generate, prompt, timeout, usage)
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google.generativeai client."""
+
+    def __init__(self, api_key: str, model_name: str, temperature: float = LLM_TEMPERATURE):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.temperature = temperature
+        # The temperature the cache keys claim is the one every request is sent with
+        self.model = genai.GenerativeModel(model_name, generation_config={"temperature": temperature})
+
+    @staticmethod
+    def _request_options(timeout: Optional[float]) -> dict:
+        return {"timeout": timeout} if timeout is not None else {}
+
+    @staticmethod
+    def _record_usage(response, usage: Optional[Dict[str, int]]):
+        """Copy the token counts Gemini reports on a response (or stream chunk) into `usage`."""
+        metadata = getattr(response, "usage_metadata", None)
+        if usage is None or not metadata:
+            return
+        usage["prompt_tokens"] = metadata.prompt_token_count
+        usage["completion_tokens"] = metadata.candidates_token_count
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> str:
+        response = self.model.generate_content(prompt, request_options=self._request_options(timeout))
+        self._record_usage(response, usage)
+        return response.text
+
+    def stream(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        # Each chunk carries the running totals, so the last one has the final counts
+        for chunk in self.model.generate_content(prompt, stream=True, request_options=self._request_options(timeout)):
+            self._record_usage(chunk, usage)
+            yield chunk.text
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> str:
+        response = await self.model.generate_content_async(prompt, request_options=self._request_options(timeout))
+        self._record_usage(response, usage)
+        return response.text
+
+class FakeLLMError(Exception):
+    """Simulated API error carrying an HTTP status code like google.api_core errors."""
+
+    def __init__(self, code: int):
+        super().__init__(f"Simulated LLM error (status {code})")
+        self.code = code
+
+_WORDS = (
+    "the concept builds on a simple idea that is easy to practice once you see how each part "
+    "fits together so start with an example then notice the pattern and apply it step by step "
+    "while checking your understanding against the key points below"
+).split()
+
+class FakeLLMBackend(LLMBackend):
+    """Deterministic local backend with simulated latency, streaming and errors.
+
+    Responses depend only on the prompt. Latency is sampled per call from a
+    constant, uniform (0 to twice the mean) or lognormal distribution with the
+    given mean; streams spread that latency evenly across their chunks.
+    """
+
+    model_name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_LLM_LATENCY_MS,
+        distribution: str = FAKE_LLM_LATENCY_DISTRIBUTION,
+        sigma: float = FAKE_LLM_LATENCY_SIGMA,
+        error_rate: float = FAKE_LLM_ERROR_RATE,
+        error_code: int = FAKE_LLM_ERROR_CODE,
+        stream_chunks: int = FAKE_LLM_STREAM_CHUNKS,
+        response_words: int = FAKE_LLM_RESPONSE_WORDS,
+        seed: int = FAKE_LLM_SEED
+    ):
+        if distribution not in ("constant", "uniform", "lognormal"):
+            raise ValueError(f"Unknown fake LLM latency distribution: {distribution}")
+
+        self.latency = latency_ms / 1000.0
+        self.distribution = distribution
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.stream_chunks = max(1, stream_chunks)
+        self.response_words = response_words
+
+        # A seeded generator makes latency and error sequences reproducible across runs
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _sample(self):
+        """Return (latency in seconds, whether this call fails) for the next call."""
+        with self._lock:
+            self.calls += 1
+            if self.distribution == "constant":
+                latency = self.latency
+            elif self.distribution == "uniform":
+                latency = self._random.uniform(0, 2 * self.latency)
+            else:
+                # Shift mu so the distribution's mean equals the configured latency
+                mu = math.log(self.latency) - self.sigma ** 2 / 2 if self.latency > 0 else 0.0
+                latency = self._random.lognormvariate(mu, self.sigma) if self.latency > 0 else 0.0
+            return latency, self._random.random() < self.error_rate
+
+    def respond(self, prompt: str) -> str:
+        """Return the deterministic response text for a prompt."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+        words = [rng.choice(_WORDS) for _ in range(self.response_words)]
+        return f"[fake response {digest[:8]}] " + " ".join(words) + "."
+
+    @staticmethod
+    def _record_usage(prompt: str, text: str, usage: Optional[Dict[str, int]]):
+        """Report token counts estimated the same way as the prompt context budget."""
+        if usage is None:
+            return
+
+        # Imported here so loading the backends does not pull in langchain_core
+        from context_builder import estimate_tokens
+        usage["prompt_tokens"] = estimate_tokens(prompt)
+        usage["completion_tokens"] = estimate_tokens(text)
+
+    def _chunks(self, text: str):
+        size = math.ceil(len(text) / self.stream_chunks)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> str:
+        latency, fails = self._sample()
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Simulated LLM call timed out after {timeout:.1f}s")
+
+        time.sleep(latency)
+        if fails:
+            raise FakeLLMError(self.error_code)
+        text = self.respond(prompt)
+        self._record_usage(prompt, text, usage)
+        return text
+
+    def stream(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        latency, fails = self._sample()
+        text = self.respond(prompt)
+        chunks = self._chunks(text)
+        delay = latency / len(chunks)
+
+        # Failures and timeouts surface before the first chunk, like a rejected request
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Simulated LLM call timed out after {timeout:.1f}s")
+        if fails:
+            time.sleep(delay)
+            raise FakeLLMError(self.error_code)
+
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+        self._record_usage(prompt, text, usage)
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, int]] = None) -> str:
+        latency, fails = self._sample()
+        if timeout is not None and latency > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"Simulated LLM call timed out after {timeout:.1f}s")
+
+        await asyncio.sleep(latency)
+        if fails:
+            raise FakeLLMError(self.error_code)
+        text = self.respond(prompt)
+        self._record_usage(prompt, text, usage)
+        return text
@@ -0,0 +1,109 @@
+"""
+Speculative generation of the next evaluation question.
+
+After a tutorial or a piece of feedback, the agent asks for the question the
+user would get from "Test Me" to be generated in the background, keyed by
+conversation and evaluation count. A question asked in between makes the
+prefetch stale, so it is discarded and the evaluation is generated live. A
+later request with the same key is served from the prefetched result;
+anything else discards it.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+from config import PREFETCH_WORKERS, PREFETCH_MAX_PENDING
+
+class EvaluationPrefetcher:
+    """Runs speculative LLM calls on a small thread pool and tracks how many pay off."""
+
+    def __init__(self, max_workers: int = PREFETCH_WORKERS, max_pending: int = PREFETCH_MAX_PENDING):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="evaluation-prefetch")
+
+        # conversation_id -> (evaluation_count, future); at most one per conversation
+        self._pending: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.scheduled = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self.errors = 0
+
+    def schedule(self, conversation_id: int, evaluation_count: int, generate: Callable[[], str]):
+        """Start generating the question for this conversation's next evaluation."""
+        with self._lock:
+            self._discard_locked(conversation_id)
+
+            future = self._executor.submit(generate)
+            self._pending[conversation_id] = (evaluation_count, future)
+            self.scheduled += 1
+
+            while len(self._pending) > self.max_pending:
+                oldest = next(iter(self._pending))
+                self._discard_locked(oldest)
+
+        # Added outside the lock: on a future that has already finished the
+        # callback runs immediately, and it takes the lock itself
+        future.add_done_callback(self._record_error)
+
+    def take(self, conversation_id: int, evaluation_count: int) -> Optional[Future]:
+        """Claim the prefetched question for this evaluation, or None if there isn't one.
+
+        A prefetch made for a different evaluation count is stale and is discarded.
+        """
+        with self._lock:
+            entry = self._pending.get(conversation_id)
+
+            if entry is None or entry[0] != evaluation_count:
+                self._discard_locked(conversation_id)
+                self.misses += 1
+                return None
+
+            del self._pending[conversation_id]
+            self.hits += 1
+            return entry[1]
+
+    def discard(self, conversation_id: int):
+        """Drop any prefetch for the conversation, cancelling it if it hasn't started."""
+        with self._lock:
+            self._discard_locked(conversation_id)
+
+    def _discard_locked(self, conversation_id: int):
+        """Drop a pending prefetch; the caller holds the lock."""
+        entry = self._pending.pop(conversation_id, None)
+        if entry is None:
+            return
+
+        # A prefetch cancelled before it started cost nothing
+        if not entry[1].cancel():
+            self.wasted += 1
+
+    def _record_error(self, future: Future):
+        """Count prefetches that failed, so they show up in the stats."""
+        if not future.cancelled() and future.exception() is not None:
+            with self._lock:
+                self.errors += 1
+
+    def shutdown(self):
+        """Cancel queued prefetches and stop the worker threads."""
+        with self._lock:
+            for conversation_id in list(self._pending):
+                self._discard_locked(conversation_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return prefetch hit rate and the number of wasted LLM calls."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "pending": len(self._pending),
+                "scheduled": self.scheduled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "wasted": self.wasted,
+                "errors": self.errors,
+                "hit_rate": self.hits / requests if requests else 0.0
+            }
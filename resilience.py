@@ -0,0 +1,313 @@
+"""
+Timeouts, retries, circuit breaking and request hedging for LLM calls.
+
+The policy wraps any callable that takes a per-attempt timeout in seconds,
+so it works the same against the Gemini client and a local fake model.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import (
+    LLM_ATTEMPT_TIMEOUT_SECONDS, LLM_DEADLINE_SECONDS, LLM_MAX_RETRIES, LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS, LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS,
+    LLM_HEDGE_ENABLED, LLM_HEDGE_MIN_DELAY_SECONDS
+)
+
+# HTTP status codes (as exposed on google.api_core exceptions) worth retrying
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """Stops calling a failing backend for a cool-down period after repeated failures."""
+
+    def __init__(self, failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = LLM_CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return "closed", "open" or "half_open"."""
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return "open"
+            return "half_open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless a call may go through now.
+
+        Returns True when the call is the half-open trial; its caller must
+        then call release_trial once the call is over, however it ended.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return False
+
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(f"LLM temporarily unavailable, retrying in {max(remaining, 0):.0f}s")
+
+            # Half-open: let a single trial call through
+            self._trial_in_flight = True
+            return True
+
+    def release_trial(self):
+        """Let the next half-open trial through once this one has finished."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient: a timeout, a connection error or a retryable status code."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Return the server-requested retry delay in seconds, if the error carries one."""
+    delay = getattr(error, "retry_after", None)
+    if delay is not None:
+        return float(delay)
+
+    # google.api_core errors carry a RetryInfo detail with a protobuf Duration
+    for detail in getattr(error, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+    return None
+
+class ResiliencePolicy:
+    """Runs LLM calls with a deadline, retries with jittered backoff, a circuit breaker and optional hedging."""
+
+    def __init__(
+        self,
+        attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS,
+        deadline: float = LLM_DEADLINE_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        hedge_min_delay: float = LLM_HEDGE_MIN_DELAY_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 32
+    ):
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+
+        # Sync attempts run on worker threads so a hung call can be abandoned at its timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-call")
+
+        self._latencies: deque = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _record_latency(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> float:
+        """Delay before a hedged request: the p95 of recent successful latencies."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < 20:
+            return max(self.hedge_min_delay, self.attempt_timeout / 2)
+        return max(self.hedge_min_delay, latencies[int(len(latencies) * 0.95) - 1])
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Full-jitter exponential backoff, never shorter than a server-requested delay."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, requested)
+        elif getattr(error, "code", None) == 429:
+            # Rate limited without a hint: wait at least the base delay
+            delay = max(delay, self.backoff_base * 2 ** attempt)
+        return delay
+
+    def call(self, fn: Callable[[float], Any]) -> Any:
+        """Call fn(timeout) until it succeeds, the retries run out or the deadline passes."""
+        deadline = time.monotonic() + self.deadline
+
+        for attempt in range(self.max_retries + 1):
+            trial = self.breaker.before_call()
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+
+            try:
+                result = self._attempt(fn, timeout)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                # Any failure counts, so a half-open trial that fails for good reopens the circuit
+                self.breaker.record_failure()
+                if not is_retryable(e):
+                    raise
+
+                delay = self._backoff(attempt, e)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    raise
+            finally:
+                # Released on every outcome, cancellation included, and before any backoff
+                if trial:
+                    self.breaker.release_trial()
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+
+    def _attempt(self, fn: Callable[[float], Any], timeout: float) -> Any:
+        """Run one attempt, hedging it with a second request if it is slow."""
+        if timeout <= 0:
+            raise TimeoutError("LLM call deadline exceeded")
+
+        started = time.monotonic()
+        futures = {self._executor.submit(fn, timeout)}
+        hedged = None
+
+        if self.hedge:
+            done, _ = wait(futures, timeout=min(self.hedge_delay(), timeout))
+            if not done:
+                with self._lock:
+                    self.hedges += 1
+                hedged = self._executor.submit(fn, timeout - (time.monotonic() - started))
+                futures.add(hedged)
+
+        error: Optional[BaseException] = None
+
+        # Take the first request to succeed; only fail once every request has
+        while futures:
+            remaining = timeout - (time.monotonic() - started)
+            done, futures = wait(futures, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+
+            for future in done:
+                if future.exception() is None:
+                    for other in futures:
+                        other.cancel()
+                    self._record_latency(time.monotonic() - started)
+                    if future is hedged:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+
+        if futures or error is None:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"LLM call timed out after {timeout:.1f}s")
+        raise error
+
+    async def acall(self, fn: Callable[[float], Awaitable[Any]]) -> Any:
+        """Async variant of call for fn(timeout) returning an awaitable."""
+        deadline = time.monotonic() + self.deadline
+
+        for attempt in range(self.max_retries + 1):
+            trial = self.breaker.before_call()
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+
+            try:
+                result = await self._aattempt(fn, timeout)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                # Any failure counts, so a half-open trial that fails for good reopens the circuit
+                self.breaker.record_failure()
+                if not is_retryable(e):
+                    raise
+
+                delay = self._backoff(attempt, e)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    raise
+            finally:
+                # Released on every outcome, cancellation included, and before any backoff
+                if trial:
+                    self.breaker.release_trial()
+
+            with self._lock:
+                self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def _aattempt(self, fn: Callable[[float], Awaitable[Any]], timeout: float) -> Any:
+        """Async variant of _attempt."""
+        if timeout <= 0:
+            raise TimeoutError("LLM call deadline exceeded")
+
+        started = time.monotonic()
+        tasks = {asyncio.ensure_future(fn(timeout))}
+        hedged = None
+
+        try:
+            if self.hedge:
+                done, _ = await asyncio.wait(tasks, timeout=min(self.hedge_delay(), timeout))
+                if not done:
+                    with self._lock:
+                        self.hedges += 1
+                    hedged = asyncio.ensure_future(fn(timeout - (time.monotonic() - started)))
+                    tasks.add(hedged)
+
+            error: Optional[BaseException] = None
+            while tasks:
+                remaining = timeout - (time.monotonic() - started)
+                done, tasks = await asyncio.wait(tasks, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+
+                for task in done:
+                    if task.exception() is None:
+                        self._record_latency(time.monotonic() - started)
+                        if task is hedged:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+
+            if tasks or error is None:
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError(f"LLM call timed out after {timeout:.1f}s")
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return retry, timeout and hedging counters and the circuit state."""
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "circuit": self.breaker.state
+            }
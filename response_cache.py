@@ -0,0 +1,148 @@
+"""
+Two-tier cache of LLM responses for deterministic prompts.
+
+Responses are keyed by the normalized prompt, model and temperature. Lookups
+hit an in-memory LRU first and fall back to a SQLite file that survives
+restarts and is shared between processes.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from config import (
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_MEMORY_ENTRIES, RESPONSE_CACHE_DISK_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+)
+
+class ResponseCache:
+    """In-memory LRU in front of an on-disk SQLite table, both with TTL expiry."""
+
+    def __init__(
+        self,
+        db_path: str = RESPONSE_CACHE_PATH,
+        memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+        disk_entries: int = RESPONSE_CACHE_DISK_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS
+    ):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # A single connection is enough here; every access holds the lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_responses_last_used
+                ON responses (last_used)
+            ''')
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float) -> str:
+        """Hash the whitespace-normalized prompt together with the model settings."""
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(f"{model}\0{temperature}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, model: str, temperature: float) -> Optional[str]:
+        """Return the cached response, or None on a miss."""
+        key = self.make_key(prompt, model, temperature)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+
+            with self._conn:
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+
+            # Promote to the memory tier
+            self._remember(key, row[1], row[0])
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, prompt: str, model: str, temperature: float, response: str):
+        """Store a response in both tiers, evicting the least recently used entries."""
+        key = self.make_key(prompt, model, temperature)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, response)
+
+            with self._conn:
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO responses (key, response, created_at, last_used)
+                    VALUES (?, ?, ?, ?)
+                ''', (key, response, now, now))
+
+                # Drop expired entries, then trim to the size limit
+                cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+                self.evictions += cursor.rowcount
+                cursor = self._conn.execute('''
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.disk_entries,))
+                self.evictions += cursor.rowcount
+
+    def _remember(self, key: str, created_at: float, response: str):
+        """Add an entry to the memory tier; the caller holds the lock."""
+        if self.memory_entries <= 0:
+            return
+
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached response from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the size of each tier."""
+        with self._lock:
+            disk_size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_size": len(self._memory),
+                "disk_size": disk_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,256 @@
+"""
+Semantic cache of answers to repeated questions about the same subject.
+
+Questions are embedded locally with hashed character n-gram vectors (no model
+download, CPU only) and compared with a single NumPy matrix-vector product.
+An answer is reused when a previous question about the same subject, answered
+by the same model at the same temperature, is more similar than the configured
+threshold. Entries persist in a SQLite file and the vector index is rebuilt
+from it on startup.
+"""
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    SEMANTIC_CACHE_PATH, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_DIMENSIONS
+)
+
+def _normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+class HashedNgramEmbedder:
+    """Embeds text as an L2-normalized bag of hashed character trigrams and words."""
+
+    def __init__(self, dimensions: int = SEMANTIC_CACHE_DIMENSIONS, n: int = 3):
+        self.dimensions = dimensions
+        self.n = n
+
+    def embed(self, text: str) -> np.ndarray:
+        """Return a unit-length float32 vector for the text."""
+        normalized = _normalize(text)
+        padded = f" {normalized} "
+        features = [padded[i:i + self.n] for i in range(max(1, len(padded) - self.n + 1))]
+        features += [f"w:{word}" for word in normalized.split()]
+
+        hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint32, count=len(features))
+
+        # The low bits pick the bucket and the top bit the sign, which keeps
+        # collisions from only ever adding up
+        indices = (hashes % self.dimensions).astype(np.intp)
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        np.add.at(vector, indices, signs)
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class _SubjectIndex:
+    """Growable matrix of question vectors for one subject, with their row IDs."""
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.zeros((16, dimensions), dtype=np.float32)
+        self.row_ids = np.zeros(16, dtype=np.int64)
+        self.size = 0
+
+    def append(self, row_id: int, vector: np.ndarray):
+        """Add a vector, doubling the capacity when full."""
+        if self.size == self.vectors.shape[0]:
+            self.vectors = np.resize(self.vectors, (self.size * 2, self.vectors.shape[1]))
+            self.row_ids = np.resize(self.row_ids, self.size * 2)
+
+        self.vectors[self.size] = vector
+        self.row_ids[self.size] = row_id
+        self.size += 1
+
+    def drop_through(self, row_id: int):
+        """Remove every entry with a row ID at or below `row_id`."""
+        keep = self.row_ids[:self.size] > row_id
+        kept = int(keep.sum())
+        self.vectors[:kept] = self.vectors[:self.size][keep]
+        self.row_ids[:kept] = self.row_ids[:self.size][keep]
+        self.size = kept
+
+IndexKey = Tuple[str, float, str]
+
+class SemanticCache:
+    """Nearest-neighbour answer cache over (subject, question) pairs, per model and temperature."""
+
+    def __init__(
+        self,
+        db_path: str = SEMANTIC_CACHE_PATH,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        embedder: Optional[HashedNgramEmbedder] = None
+    ):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedder = embedder or HashedNgramEmbedder()
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Lookups never cross subjects or model settings, so each (model,
+        # temperature, subject) gets its own matrix and a lookup only scans
+        # the questions asked about that subject under the same settings
+        self._indexes: Dict[IndexKey, _SubjectIndex] = {}
+        self._size = 0
+
+        # A single connection is enough here; every access holds the lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    subject TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    model TEXT NOT NULL DEFAULT '',
+                    temperature REAL NOT NULL DEFAULT 0
+                )
+            ''')
+
+            # Files written before answers were keyed by model cannot tell fake
+            # answers from real ones, so their entries are dropped
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+            if "model" not in columns:
+                self._conn.execute("ALTER TABLE answers ADD COLUMN model TEXT NOT NULL DEFAULT ''")
+                self._conn.execute("ALTER TABLE answers ADD COLUMN temperature REAL NOT NULL DEFAULT 0")
+                self._conn.execute("DELETE FROM answers")
+
+        self._load()
+
+    def _load(self):
+        """Rebuild the in-memory index from the persisted entries."""
+        rows = self._conn.execute(
+            "SELECT id, subject, vector, model, temperature FROM answers ORDER BY id DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+
+        for row_id, subject, blob, model, temperature in reversed(rows):
+            vector = np.frombuffer(blob, dtype=np.float32)
+            if vector.shape[0] == self.embedder.dimensions:
+                self._append(row_id, self._key(subject, model, temperature), vector)
+
+    @staticmethod
+    def _key(subject: str, model: str, temperature: float) -> IndexKey:
+        return (model, float(temperature), _normalize(subject))
+
+    def _append(self, row_id: int, key: IndexKey, vector: np.ndarray):
+        """Add a vector to its index; the caller holds the lock."""
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = _SubjectIndex(self.embedder.dimensions)
+
+        index.append(row_id, vector)
+        self._size += 1
+
+    def _evict(self):
+        """Drop the oldest tenth of the entries once the cache is full; the caller holds the lock and a transaction."""
+        if self._size < self.max_entries:
+            return
+
+        drop = max(1, self.max_entries // 10)
+        cutoff = self._conn.execute(
+            "SELECT id FROM answers ORDER BY id LIMIT 1 OFFSET ?", (drop - 1,)
+        ).fetchone()[0]
+        self._conn.execute("DELETE FROM answers WHERE id <= ?", (cutoff,))
+
+        for index in self._indexes.values():
+            index.drop_through(cutoff)
+        self._size = sum(index.size for index in self._indexes.values())
+
+    def nearest(self, subject: str, question: str, model: str, temperature: float) -> Optional[Tuple[float, int]]:
+        """Return (similarity, row ID) of the closest cached question about the subject under these model settings."""
+        query = self.embedder.embed(question)
+
+        with self._lock:
+            index = self._indexes.get(self._key(subject, model, temperature))
+            if index is None or not index.size:
+                return None
+
+            similarities = index.vectors[:index.size] @ query
+            best = int(np.argmax(similarities))
+            return float(similarities[best]), int(index.row_ids[best])
+
+    def lookup(self, subject: str, question: str, model: str, temperature: float) -> Optional[str]:
+        """Return a cached answer to a sufficiently similar question from the same model settings, or None."""
+        match = self.nearest(subject, question, model, temperature)
+
+        with self._lock:
+            if match is None or match[0] < self.threshold:
+                self.misses += 1
+                return None
+
+            row = self._conn.execute("SELECT answer FROM answers WHERE id = ?", (match[1],)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return row[0]
+
+    def add(self, subject: str, question: str, answer: str, model: str, temperature: float):
+        """Cache the answer a model gave to a question about a subject."""
+        self.add_many([(subject, question, answer)], model, temperature)
+
+    def add_many(self, entries: List[Tuple[str, str, str]], model: str, temperature: float):
+        """Cache many (subject, question, answer) entries from one model setting in one transaction."""
+        vectors = [self.embedder.embed(question) for _, question, _ in entries]
+        now = time.time()
+
+        with self._lock, self._conn:
+            for (subject, question, answer), vector in zip(entries, vectors):
+                self._evict()
+                cursor = self._conn.execute('''
+                    INSERT INTO answers (subject, question, answer, vector, created_at, model, temperature)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (subject, question, answer, vector.tobytes(), now, model, temperature))
+                self._append(cursor.lastrowid, self._key(subject, model, temperature), vector)
+
+    def bind(self, subject: str, question: str) -> "BoundQuestion":
+        """Adapt one question to the prompt-cache interface taken by LLM_api."""
+        return BoundQuestion(self, subject, question)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the index size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "subjects": len(self._indexes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class BoundQuestion:
+    """A (subject, question) pair exposed through the get/put interface of ResponseCache.
+
+    The prompt argument is ignored: the answer is keyed by the question's
+    meaning rather than by the exact prompt text. Like ResponseCache, entries
+    are only served to the model and temperature that produced them.
+    """
+
+    def __init__(self, cache: SemanticCache, subject: str, question: str):
+        self.cache = cache
+        self.subject = subject
+        self.question = question
+
+    def get(self, prompt: str, model: str, temperature: float) -> Optional[str]:
+        return self.cache.lookup(self.subject, self.question, model, temperature)
+
+    def put(self, prompt: str, model: str, temperature: float, response: str):
+        self.cache.add(self.subject, self.question, response, model, temperature)
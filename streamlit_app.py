@@ -1,8 +1,10 @@
 import streamlit as st
+import threading
 import uuid
 from datetime import datetime
 from tutorial_agent import TutorialAgent
-from database import TutorialDatabase
+from instrumentation import configure_logging, start_metrics_server
+from config import HISTORY_PAGE_SIZE, SEARCH_RESULTS_LIMIT, EXAMPLE_SUBJECTS, PREWARM_ON_STARTUP
 from config import THEME_PRIMARY_COLOR, THEME_SECONDARY_COLOR, THEME_BACKGROUND_COLOR, THEME_SECONDARY_BACKGROUND_COLOR, THEME_TEXT_COLOR, THEME_CARD_COLOR, THEME_BORDER_COLOR
 
 # Configure the Streamlit page
@@ -13,11 +15,15 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def read_theme_css() -> str:
+    """Read the theme once per server process."""
+    with open("theme.css", "r") as f:
+        return f.read()
+
 # Load custom CSS theme
 def load_css():
-    with open("theme.css", "r") as f:
-        css = f.read()
-    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+    st.markdown(f"<style>{read_theme_css()}</style>", unsafe_allow_html=True)
 
 # Apply custom theme
 load_css()
@@ -26,8 +32,31 @@ load_css()
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
 
+@st.cache_resource
+def start_instrumentation():
+    """Set up structured logging and the local metrics endpoint, once per server process."""
+    configure_logging()
+    return start_metrics_server()
+
+start_instrumentation()
+
+@st.cache_resource
+def get_agent() -> TutorialAgent:
+    """Create the agent once per server process; every session shares its graph, DB pool and caches."""
+    return TutorialAgent()
+
 if "agent" not in st.session_state:
-    st.session_state.agent = TutorialAgent()
+    st.session_state.agent = get_agent()
+
+@st.cache_resource
+def start_prewarm_job(_agent: TutorialAgent) -> threading.Thread:
+    """Pre-generate the example tutorials in the background, once per server process."""
+    thread = threading.Thread(target=_agent.prewarm_tutorials, name="tutorial-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+if PREWARM_ON_STARTUP:
+    start_prewarm_job(st.session_state.agent)
 
 if "current_conversation_id" not in st.session_state:
     st.session_state.current_conversation_id = None
@@ -35,6 +64,9 @@ if "current_conversation_id" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+if "oldest_message_id" not in st.session_state:
+    st.session_state.oldest_message_id = None
+
 if "subject" not in st.session_state:
     st.session_state.subject = ""
 
@@ -44,6 +76,14 @@ if "selected_example_subject" not in st.session_state:
 if "quick_action_message" not in st.session_state:
     st.session_state.quick_action_message = ""
 
+# Pages of the session list shown in the sidebar
+if "session_list_pages" not in st.session_state:
+    st.session_state.session_list_pages = 1
+
+# Messages drawn by the last full run; the chat fragment only draws the ones after them
+if "rendered_messages" not in st.session_state:
+    st.session_state.rendered_messages = 0
+
 def start_new_tutorial(subject_override=None):
     """Start a new tutorial session."""
     # Use override subject if provided, otherwise get from input
@@ -51,18 +91,23 @@ def start_new_tutorial(subject_override=None):
 
     if subject and subject.strip():
         try:
-            # Start new tutorial
-            result = st.session_state.agent.start_tutorial(
+            # Start new tutorial, rendering it as it streams in
+            result = st.session_state.agent.start_tutorial_stream(
                 st.session_state.session_id,
                 subject.strip()
             )
 
+            with st.chat_message("assistant"):
+                st.markdown("### 📚 Tutorial Content")
+                response = st.write_stream(result["stream"])
+
             # Update session state
             st.session_state.current_conversation_id = result["conversation_id"]
             st.session_state.subject = subject.strip()
             st.session_state.chat_history = [
-                {"role": "assistant", "content": result["response"], "type": "tutorial"}
+                {"role": "assistant", "content": response, "type": "tutorial"}
             ]
+            st.session_state.oldest_message_id = None
 
             # Clear any stored example subject
             st.session_state.selected_example_subject = ""
@@ -78,20 +123,30 @@ def send_message(message_override=None):
     # Use override message if provided, otherwise get from input
     user_input = message_override if message_override else st.session_state.get("user_input", "")
 
-    if user_input and user_input.strip() and st.session_state.current_conversation_id:
-        try:
+    try:
+        if user_input and user_input.strip() and st.session_state.current_conversation_id:
             # Determine input type
             input_type = "question"
             if "test me" in user_input.lower() or "quiz" in user_input.lower() or "evaluate" in user_input.lower():
                 input_type = "evaluation_request"
 
-            # Get AI response
-            result = st.session_state.agent.continue_conversation(
+            # Get AI response, rendering it as it streams in
+            result = st.session_state.agent.continue_conversation_stream(
                 st.session_state.current_conversation_id,
                 user_input.strip(),
                 input_type
             )
 
+            if "error" in result:
+                st.error(f"Error processing message: {result['error']}")
+                return
+
+            with st.chat_message("user"):
+                st.write(user_input.strip())
+
+            with st.chat_message("assistant"):
+                response = st.write_stream(result["stream"])
+
             # Update chat history
             st.session_state.chat_history.append({
                 "role": "user",
@@ -101,56 +156,236 @@ def send_message(message_override=None):
 
             st.session_state.chat_history.append({
                 "role": "assistant",
-                "content": result["response"],
+                "content": response,
                 "type": "response"
             })
 
-            # Clear quick action message if it was used
-            if message_override:
-                st.session_state.quick_action_message = ""
-
-            st.rerun()
-
-        except Exception as e:
-            st.error(f"Error processing message: {str(e)}")
+    except Exception as e:
+        st.error(f"Error processing message: {str(e)}")
+    finally:
+        # A quick action is sent once, even if it failed, so fragment reruns don't resend it
+        if message_override:
+            st.session_state.quick_action_message = ""
+
+def to_chat_messages(history):
+    """Convert database history to chat format."""
+    return [
+        {
+            "role": msg["role"],
+            "content": msg["content"],
+            "type": msg.get("message_type", "message")
+        }
+        for msg in history
+    ]
 
 def load_conversation(conversation_id: int):
     """Load a previous conversation."""
     try:
-        db = TutorialDatabase()
-        history = db.get_conversation_history(conversation_id)
-
-        # Get conversation subject
-        import sqlite3
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT subject FROM conversations WHERE id = ?", (conversation_id,))
-        result = cursor.fetchone()
-        conn.close()
-
-        if result:
+        db = st.session_state.agent.db
+
+        # Get conversation subject and its most recent page of messages
+        conversation = db.get_conversation_tail(conversation_id, HISTORY_PAGE_SIZE)
+
+        if conversation:
+            history = conversation["messages"]
+
             st.session_state.current_conversation_id = conversation_id
-            st.session_state.subject = result[0]
-            st.session_state.chat_history = []
-
-            # Convert database history to chat format
-            for msg in history:
-                role = msg["role"]
-                content = msg["content"]
-                msg_type = msg.get("message_type", "message")
-
-                st.session_state.chat_history.append({
-                    "role": role,
-                    "content": content,
-                    "type": msg_type
-                })
-
-            st.success(f"Loaded conversation about: {result[0]}")
+            st.session_state.subject = conversation["subject"]
+            st.session_state.chat_history = to_chat_messages(history)
+
+            # Older messages are fetched on demand from this cursor
+            st.session_state.oldest_message_id = history[0]["id"] if conversation["has_more"] else None
+
+            st.success(f"Loaded conversation about: {conversation['subject']}")
             st.rerun()
 
     except Exception as e:
         st.error(f"Error loading conversation: {str(e)}")
 
+def load_older_messages():
+    """Prepend the previous page of messages to the chat history."""
+    try:
+        page = st.session_state.agent.db.get_messages_page(
+            st.session_state.current_conversation_id,
+            before_id=st.session_state.oldest_message_id,
+            limit=HISTORY_PAGE_SIZE
+        )
+
+        st.session_state.chat_history = to_chat_messages(page) + st.session_state.chat_history
+        st.session_state.oldest_message_id = page[0]["id"] if len(page) == HISTORY_PAGE_SIZE else None
+
+    except Exception as e:
+        st.error(f"Error loading older messages: {str(e)}")
+
+def show_more_sessions():
+    """Button callback adding a page to the sidebar's session list."""
+    st.session_state.session_list_pages += 1
+
+@st.fragment
+def render_sidebar():
+    """Sidebar for conversation management; typing in it reruns only the sidebar."""
+    st.header("📚 Tutorial Sessions")
+
+    # New tutorial section
+    st.subheader("Start New Tutorial")
+    new_subject = st.text_input(
+        "What would you like to learn about?",
+        placeholder="e.g., Python functions, Machine Learning, History of Rome...",
+        key="new_subject_input"
+    )
+
+    if st.button("Start Tutorial", type="primary"):
+        # Start from the main area so the tutorial streams into the page
+        if new_subject and new_subject.strip():
+            st.session_state.selected_example_subject = new_subject
+            st.rerun()
+
+    # Previous conversations
+    st.subheader("📜 Previous Sessions")
+    try:
+        db = st.session_state.agent.db
+
+        # Each page is cached by the database until the session starts a new conversation
+        cursor = None
+        for page_number in range(st.session_state.session_list_pages):
+            page = db.get_session_page(st.session_state.session_id, before=cursor)
+
+            for conv in page["conversations"]:
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    if st.button(
+                        conv["subject"],
+                        key=f"load_{conv['id']}",
+                        help=f"Created: {conv['created_at']}"
+                    ):
+                        load_conversation(conv['id'])
+
+                with col2:
+                    st.caption(f"{conv['created_at'][:10]} · {conv['message_count']} msgs")
+
+            cursor = page["next"]
+            if cursor is None:
+                break
+
+        if page_number == 0 and not page["conversations"]:
+            st.info("No previous sessions found.")
+        elif cursor is not None:
+            st.button("Load more", key="load_more_sessions", on_click=show_more_sessions)
+
+    except Exception as e:
+        st.error(f"Error loading conversations: {str(e)}")
+
+    # Full-text search over this session's tutorials, questions and answers
+    st.subheader("🔎 Search Past Sessions")
+    search_query = st.text_input(
+        "Search your tutorials and answers",
+        placeholder="e.g., list comprehension",
+        key="search_query"
+    )
+
+    if search_query and search_query.strip():
+        try:
+            results = st.session_state.agent.db.search(
+                search_query,
+                session_id=st.session_state.session_id,
+                limit=SEARCH_RESULTS_LIMIT
+            )
+
+            if results:
+                for result in results:
+                    if st.button(
+                        f"{result['subject'][:30]}",
+                        key=f"search_{result['message_id']}",
+                        help=f"{result['message_type']} from {result['timestamp']}"
+                    ):
+                        load_conversation(result["conversation_id"])
+                    st.caption(result["snippet"])
+            else:
+                st.info("No matches found.")
+
+        except Exception as e:
+            st.error(f"Error searching: {str(e)}")
+
+    # Help section
+    st.subheader("💡 How to Use")
+    st.markdown("""
+    1. **Start a Tutorial**: Enter any subject you want to learn
+    2. **Ask Questions**: Ask follow-up questions about the material
+    3. **Get Evaluated**: Say "test me" or "quiz me" for practice questions
+    4. **Review History**: Access previous learning sessions
+    """)
+
+def render_message(message):
+    """Draw one chat history entry."""
+    if message["role"] == "user":
+        with st.chat_message("user"):
+            st.write(message["content"])
+    else:
+        with st.chat_message("assistant"):
+            # Add icons based on message type
+            if message.get("type") == "tutorial":
+                st.markdown("### 📚 Tutorial Content")
+            elif message.get("type") == "evaluation_question":
+                st.markdown("### 🤔 Quick Check")
+            elif message.get("type") == "evaluation_feedback":
+                st.markdown("### ✅ Feedback")
+
+            st.write(message["content"])
+
+def ask(message: str):
+    """Button callback queueing a message; the chat fragment rerun that follows streams its reply."""
+    if message and message.strip():
+        st.session_state.quick_action_message = message
+
+@st.fragment
+def render_chat():
+    """New messages, the reply being streamed and the input controls.
+
+    A turn reruns only this fragment, which draws the messages added since
+    the last full run rather than the whole history.
+    """
+    for message in st.session_state.chat_history[st.session_state.rendered_messages:]:
+        render_message(message)
+
+    # Stream the reply to a pending message below the existing history
+    if st.session_state.quick_action_message:
+        send_message(st.session_state.quick_action_message)
+
+    # User input
+    st.markdown("---")
+    col1, col2, col3 = st.columns([6, 1, 1])
+
+    with col1:
+        st.text_input(
+            "Ask a question or request evaluation:",
+            placeholder="e.g., Can you explain this in more detail? or Test my understanding!",
+            key="user_input"
+        )
+
+    # Buttons queue their message in a callback, before the fragment reruns,
+    # so the reply streams above them in the same run
+    with col2:
+        st.button("Send 💬", on_click=lambda: ask(st.session_state.user_input))
+
+    with col3:
+        st.button("Test Me 🧠", on_click=ask, args=("Please test my understanding with a question.",))
+
+    # Quick action buttons
+    st.markdown("### Quick Actions")
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.button("📝 More Examples", on_click=ask, args=("Can you provide more examples?",))
+
+    with col2:
+        st.button("🔍 Explain Further", on_click=ask, args=("Can you explain this topic in more detail?",))
+
+    with col3:
+        st.button("🎯 Real Applications", on_click=ask, args=("What are some real-world applications of this?",))
+
+    with col4:
+        st.button("📚 Next Steps", on_click=ask, args=("What should I learn next?",))
+
 def main():
     """Main Streamlit application."""
 
@@ -159,11 +394,6 @@ def main():
         start_new_tutorial(st.session_state.selected_example_subject)
         return
 
-    # Check if a quick action was triggered
-    if st.session_state.quick_action_message:
-        send_message(st.session_state.quick_action_message)
-        return
-
     # Header with custom styling
     st.markdown("""
     <div style="text-align: center; margin-bottom: 2rem;">
@@ -176,52 +406,7 @@ def main():
 
     # Sidebar for conversation management
     with st.sidebar:
-        st.header("📚 Tutorial Sessions")
-
-        # New tutorial section
-        st.subheader("Start New Tutorial")
-        new_subject = st.text_input(
-            "What would you like to learn about?",
-            placeholder="e.g., Python functions, Machine Learning, History of Rome...",
-            key="new_subject_input"
-        )
-
-        if st.button("Start Tutorial", type="primary"):
-            start_new_tutorial()
-
-        # Previous conversations
-        st.subheader("📜 Previous Sessions")
-        try:
-            db = TutorialDatabase()
-            conversations = db.get_conversations_by_session(st.session_state.session_id)
-
-            if conversations:
-                for conv in conversations:
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        if st.button(
-                            f"{conv['subject'][:30]}...",
-                            key=f"load_{conv['id']}",
-                            help=f"Created: {conv['created_at']}"
-                        ):
-                            load_conversation(conv['id'])
-
-                    with col2:
-                        st.caption(f"{conv['created_at'][:10]}")
-            else:
-                st.info("No previous sessions found.")
-
-        except Exception as e:
-            st.error(f"Error loading conversations: {str(e)}")
-
-        # Help section
-        st.subheader("💡 How to Use")
-        st.markdown("""
-        1. **Start a Tutorial**: Enter any subject you want to learn
-        2. **Ask Questions**: Ask follow-up questions about the material
-        3. **Get Evaluated**: Say "test me" or "quiz me" for practice questions
-        4. **Review History**: Access previous learning sessions
-        """)
+        render_sidebar()
 
     # Main chat area
     if st.session_state.current_conversation_id:
@@ -233,71 +418,17 @@ def main():
         </div>
         """, unsafe_allow_html=True)
 
-        # Chat container
-        chat_container = st.container()
-
-        with chat_container:
-            # Display chat history
-            for message in st.session_state.chat_history:
-                if message["role"] == "user":
-                    with st.chat_message("user"):
-                        st.write(message["content"])
-                else:
-                    with st.chat_message("assistant"):
-                        # Add icons based on message type
-                        if message.get("type") == "tutorial":
-                            st.markdown("### 📚 Tutorial Content")
-                        elif message.get("type") == "evaluation_question":
-                            st.markdown("### 🤔 Quick Check")
-                        elif message.get("type") == "evaluation_feedback":
-                            st.markdown("### ✅ Feedback")
-
-                        st.write(message["content"])
-
-        # User input
-        st.markdown("---")
-        col1, col2, col3 = st.columns([6, 1, 1])
-
-        with col1:
-            user_input = st.text_input(
-                "Ask a question or request evaluation:",
-                placeholder="e.g., Can you explain this in more detail? or Test my understanding!",
-                key="user_input"
-            )
-
-        with col2:
-            if st.button("Send 💬"):
-                send_message()
-
-        with col3:
-            if st.button("Test Me 🧠"):
-                if st.session_state.current_conversation_id:
-                    st.session_state.quick_action_message = "Please test my understanding with a question."
-                    st.rerun()
-
-        # Quick action buttons
-        st.markdown("### Quick Actions")
-        col1, col2, col3, col4 = st.columns(4)
-
-        with col1:
-            if st.button("📝 More Examples"):
-                st.session_state.quick_action_message = "Can you provide more examples?"
+        if st.session_state.oldest_message_id:
+            if st.button("⬆️ Load older messages"):
+                load_older_messages()
                 st.rerun()
 
-        with col2:
-            if st.button("🔍 Explain Further"):
-                st.session_state.quick_action_message = "Can you explain this topic in more detail?"
-                st.rerun()
+        # The history is drawn by full runs only; turns are appended below it by the chat fragment
+        for message in st.session_state.chat_history:
+            render_message(message)
+        st.session_state.rendered_messages = len(st.session_state.chat_history)
 
-        with col3:
-            if st.button("🎯 Real Applications"):
-                st.session_state.quick_action_message = "What are some real-world applications of this?"
-                st.rerun()
-
-        with col4:
-            if st.button("📚 Next Steps"):
-                st.session_state.quick_action_message = "What should I learn next?"
-                st.rerun()
+        render_chat()
 
     else:
         # Welcome screen with enhanced styling
@@ -345,16 +476,9 @@ def main():
         </div>
         """, unsafe_allow_html=True)
 
-        example_subjects = [
-            "Python Programming", "Machine Learning", "Data Science",
-            "Web Development", "Statistics", "Linear Algebra",
-            "Computer Networks", "Database Design", "API Development",
-            "React.js", "Docker", "Git Version Control"
-        ]
-
         # Create a grid of buttons using columns
         cols = st.columns(3)
-        for i, subject in enumerate(example_subjects):
+        for i, subject in enumerate(EXAMPLE_SUBJECTS):
             col_idx = i % 3
             with cols[col_idx]:
                 if st.button(f"📚 {subject}", key=f"example_{i}", use_container_width=True):
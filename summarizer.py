@@ -0,0 +1,97 @@
+"""
+Background summarization of conversation turns older than the history window.
+
+After a turn pushes messages out of the window the agent keeps in memory, it
+schedules the conversation here. Once at least SUMMARY_EVERY_TURNS turns have
+left the window since the stored summary, a worker folds them into the
+conversation's rolling summary with one LLM call and stores it in the
+database. Prompts read the stored summary instead of older turns.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from config import HISTORY_WINDOW_MESSAGES, SUMMARY_EVERY_TURNS, SUMMARY_MAX_MESSAGES, SUMMARY_WORKERS
+
+class ConversationSummarizer:
+    """Runs summary updates on a small thread pool, at most one per conversation at a time."""
+
+    def __init__(
+        self,
+        db,
+        summarize: Callable[[int, str, str, List[Dict[str, Any]]], str],
+        every_turns: int = SUMMARY_EVERY_TURNS,
+        keep_recent: int = HISTORY_WINDOW_MESSAGES,
+        max_messages: int = SUMMARY_MAX_MESSAGES,
+        max_workers: int = SUMMARY_WORKERS
+    ):
+        """`summarize(conversation_id, subject, previous_summary, messages)` returns the updated summary text."""
+        self.db = db
+        self.summarize = summarize
+        self.every_turns = every_turns
+        self.keep_recent = keep_recent
+        self.max_messages = max_messages
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="conversation-summary")
+
+        self._pending = set()
+        self._lock = threading.Lock()
+
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def schedule(self, conversation_id: int):
+        """Queue a summary update for the conversation unless one is already queued."""
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+
+        self._executor.submit(self._run, conversation_id)
+
+    def _run(self, conversation_id: int):
+        """Fold the turns that left the window into the stored summary, in batches."""
+        try:
+            conversation = self.db.get_conversation(conversation_id)
+            stored = self.db.get_summary(conversation_id)
+            summary, through_id = (stored["summary"], stored["through_message_id"]) if stored else ("", 0)
+
+            updated = False
+            while conversation:
+                messages = self.db.get_messages_to_summarize(conversation_id, through_id, self.keep_recent, self.max_messages)
+
+                # A turn is a user message and the reply to it
+                if len(messages) < self.every_turns * 2:
+                    break
+
+                summary = self.summarize(conversation_id, conversation["subject"], summary, messages)
+                through_id = messages[-1]["id"]
+                self.db.save_summary(conversation_id, summary, through_id)
+                updated = True
+
+            with self._lock:
+                if updated:
+                    self.runs += 1
+                else:
+                    self.skipped += 1
+        except Exception:
+            # The summary is retried on the conversation's next turn
+            with self._lock:
+                self.errors += 1
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
+
+    def shutdown(self):
+        """Cancel queued updates and stop the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counts of summary updates, skipped checks and failures."""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "runs": self.runs,
+                "skipped": self.skipped,
+                "errors": self.errors
+            }
@@ -0,0 +1,26 @@
+"""Checkpoint pruning cadence."""
+import sqlite3
+
+from checkpointer import ConversationCheckpointer
+
+def test_prunes_every_n_turns_per_conversation():
+    saver = ConversationCheckpointer(sqlite3.connect(":memory:", check_same_thread=False), prune_every=3)
+    pruned = []
+    saver.prune = pruned.append
+
+    for _ in range(7):
+        saver.finish_turn(1)
+    saver.finish_turn(2)
+
+    assert pruned == [1, 1]
+
+def test_turn_counts_are_bounded_and_evicted_conversations_pruned():
+    saver = ConversationCheckpointer(sqlite3.connect(":memory:", check_same_thread=False), prune_every=10, max_tracked=2)
+    pruned = []
+    saver.prune = pruned.append
+
+    for conversation_id in (1, 2, 3, 4):
+        saver.finish_turn(conversation_id)
+
+    assert pruned == [1, 2]
+    assert list(saver._turns) == [3, 4]
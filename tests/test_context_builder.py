@@ -0,0 +1,49 @@
+"""Prompt context stays within its token budget however long the conversation runs."""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from context_builder import ContextBuilder, estimate_tokens
+
+TUTORIAL = "A tutorial paragraph explaining the subject with an example. " * 60
+SUMMARY = "The student asked about list comprehensions and answered one evaluation well."
+ANSWER = "Here is a detailed answer. It walks through the idea step by step. " * 15
+
+def turns(count: int, numbered: bool = True) -> list:
+    messages = []
+    for i in range(count):
+        question = f"Question number {i}?" if numbered else "Another question?"
+        messages += [HumanMessage(content=question), AIMessage(content=ANSWER)]
+    return messages
+
+@pytest.fixture
+def builder() -> ContextBuilder:
+    return ContextBuilder(budget_tokens=800, tutorial_tokens=300, message_tokens=150, summary_tokens=120)
+
+@pytest.mark.parametrize("count", [0, 1, 10, 100, 1000])
+def test_context_stays_within_budget(builder, count):
+    context = builder.build(TUTORIAL, turns(count), SUMMARY)
+
+    assert estimate_tokens(context) <= builder.budget_tokens
+
+def test_context_size_does_not_grow_with_history(builder):
+    sizes = {len(builder.build(TUTORIAL, turns(count, numbered=False), SUMMARY)) for count in (20, 200, 2000)}
+
+    assert len(sizes) == 1
+
+def test_tutorial_summary_and_newest_turn_are_kept(builder):
+    context = builder.build(TUTORIAL, turns(500), SUMMARY)
+
+    assert context.startswith("Tutorial:\n" + TUTORIAL[:200])
+    assert f"Earlier in the conversation:\n{SUMMARY}" in context
+    assert "Human: Question number 499?" in context
+    assert "Question number 0?" not in context
+
+def test_fold_keeps_summary_within_budget_and_latest_turns(builder):
+    summary = ""
+    for i in range(200):
+        summary = builder.fold(summary, [HumanMessage(content=f"Question number {i}? More detail."), AIMessage(content=ANSWER)])
+
+        assert estimate_tokens(summary) <= builder.summary_tokens
+
+    assert "Human: Question number 199?" in summary
+    assert "More detail" not in summary
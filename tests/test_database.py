@@ -0,0 +1,28 @@
+"""A turn's messages and LLM call records share one unit of work."""
+import pytest
+
+from database import TutorialDatabase
+
+CALL = {"conversation_id": None, "node": "handle_question", "model": "fake", "prompt_tokens": 10, "completion_tokens": 5, "latency_ms": 1.0}
+
+@pytest.mark.parametrize("write_behind", [False, True])
+def test_unit_of_work_writes_messages_and_llm_calls(tmp_path, write_behind):
+    db = TutorialDatabase(str(tmp_path / "tutorial.db"), write_behind=write_behind)
+    conversation_id = db.create_conversation("session", "Python")
+
+    with db.unit_of_work() as uow:
+        uow.add_message(conversation_id, "user", "question", "question")
+        uow.add_message(conversation_id, "assistant", "answer", "answer")
+        uow.add_llm_calls([{**CALL, "conversation_id": conversation_id}])
+
+    assert [msg["content"] for msg in db.get_conversation_history(conversation_id)] == ["question", "answer"]
+    usage = db.get_llm_usage(group_by="conversation")
+    assert [(row["key"], row["calls"], row["prompt_tokens"]) for row in usage] == [(conversation_id, 1, 10)]
+    db.close()
+
+def test_record_llm_calls_outside_a_turn(tmp_path):
+    db = TutorialDatabase(str(tmp_path / "tutorial.db"), write_behind=True)
+    db.record_llm_calls([{**CALL, "node": "prewarm_tutorial"}])
+
+    assert [row["key"] for row in db.get_llm_usage(group_by="node")] == ["prewarm_tutorial"]
+    db.close()
@@ -0,0 +1,72 @@
+"""Span timing, collector gauges and logging setup."""
+import logging
+import time
+
+import instrumentation
+from instrumentation import Metrics
+
+def produce(closed):
+    try:
+        time.sleep(0.02)
+        yield "a"
+        time.sleep(0.02)
+        yield "b"
+    finally:
+        closed.append(True)
+
+def series(metrics: Metrics, name: str) -> dict:
+    return metrics.snapshot()["spans"][name][0]
+
+def test_consumer_time_is_not_counted():
+    metrics, closed = Metrics(), []
+    for _ in metrics.time_iterator("stream_seconds", produce(closed), node="n"):
+        time.sleep(0.1)
+
+    span = series(metrics, "stream_seconds")
+    assert span["count"] == 1 and span["labels"] == {"node": "n"}
+    assert 30 <= span["max_ms"] < 100
+    assert 15 <= series(metrics, "stream_first_chunk_seconds")["max_ms"] < 40
+    assert closed == [True]
+
+def test_early_close_closes_the_source_and_records_the_span():
+    metrics, closed = Metrics(), []
+    stream = metrics.time_iterator("stream_seconds", produce(closed))
+    next(stream)
+    stream.close()
+
+    assert closed == [True]
+    assert series(metrics, "stream_seconds")["count"] == 1
+
+def test_error_is_recorded():
+    metrics = Metrics()
+
+    def failing():
+        yield "a"
+        raise ValueError("broken")
+
+    try:
+        list(metrics.time_iterator("stream_seconds", failing()))
+    except ValueError:
+        pass
+    assert series(metrics, "stream_seconds")["errors"] == 1
+
+def test_collector_values_are_exported_as_gauges():
+    metrics = Metrics()
+    metrics.register_collector("cache", lambda: {"hits": 3, "hit_rate": 0.75, "enabled": True, "name": "lru"})
+
+    assert metrics.snapshot()["gauges"] == {"cache_hits": 3.0, "cache_hit_rate": 0.75}
+    assert "# TYPE cache_hits gauge\ncache_hits 3.0" in metrics.to_prometheus()
+
+def test_unknown_log_level_falls_back_to_info(tmp_path, monkeypatch):
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    monkeypatch.setattr(instrumentation, "_logging_configured", False)
+    try:
+        instrumentation.configure_logging(enabled=True, level="VERBOSE", path=str(tmp_path / "app.log"))
+        assert root.level == logging.INFO
+        assert "Unknown LOG_LEVEL" in (tmp_path / "app.log").read_text()
+    finally:
+        for handler in set(root.handlers) - set(handlers):
+            root.removeHandler(handler)
+            handler.close()
+        root.setLevel(level)
@@ -0,0 +1,32 @@
+"""Evaluation prefetch bookkeeping."""
+import threading
+from concurrent.futures import Future
+
+from prefetch import EvaluationPrefetcher
+
+def test_prefetch_that_has_already_failed_is_counted_without_deadlock():
+    prefetcher = EvaluationPrefetcher(max_workers=1)
+
+    # A prefetch rejected at once (say by an open circuit) is done before its callback is added
+    def submit_failed(fn):
+        future = Future()
+        future.set_exception(RuntimeError("circuit open"))
+        return future
+    prefetcher._executor.submit = submit_failed
+
+    # Scheduled on a worker thread so a deadlock fails the test instead of hanging it
+    scheduler = threading.Thread(target=prefetcher.schedule, args=(1, 0, lambda: "question"), daemon=True)
+    scheduler.start()
+    scheduler.join(timeout=5)
+
+    assert not scheduler.is_alive()
+    assert prefetcher.stats()["errors"] == 1
+    prefetcher.shutdown()
+
+def test_stale_prefetch_is_discarded():
+    prefetcher = EvaluationPrefetcher(max_workers=1)
+    prefetcher.schedule(1, 0, lambda: "question")
+
+    assert prefetcher.take(1, 1) is None
+    assert prefetcher.take(1, 0) is None
+    prefetcher.shutdown()
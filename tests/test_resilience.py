@@ -0,0 +1,182 @@
+"""Circuit breaker, retry, timeout and hedging behaviour against the local fake model."""
+import asyncio
+import time
+
+import pytest
+
+from llm_backends import FakeLLMBackend, FakeLLMError
+from resilience import CircuitBreaker, CircuitOpenError, ResiliencePolicy
+
+RESET_SECONDS = 0.05
+
+def make_policy(**overrides) -> ResiliencePolicy:
+    """A policy with short timeouts and backoff, no retries and a breaker that opens after two failures."""
+    options = {
+        "attempt_timeout": 1.0,
+        "deadline": 5.0,
+        "max_retries": 0,
+        "backoff_base": 0.001,
+        "backoff_max": 0.01,
+        "hedge": False,
+        "breaker": CircuitBreaker(failure_threshold=2, reset_timeout=RESET_SECONDS)
+    }
+    options.update(overrides)
+    return ResiliencePolicy(**options)
+
+def fake(**overrides) -> FakeLLMBackend:
+    options = {"latency_ms": 0, "distribution": "constant", "error_rate": 0.0}
+    options.update(overrides)
+    return FakeLLMBackend(**options)
+
+def failing_then(backend: FakeLLMBackend, failures: int, code: int = 503):
+    """fn(timeout) that fails `failures` times with the given status code, then calls the backend."""
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise FakeLLMError(code)
+        return backend.generate("prompt", timeout)
+
+    fn.calls = calls
+    return fn
+
+def open_circuit(policy: ResiliencePolicy):
+    """Fail enough calls to open the breaker, then wait until it is half-open."""
+    broken = fake(error_rate=1.0)
+    for _ in range(policy.breaker.failure_threshold):
+        with pytest.raises(FakeLLMError):
+            policy.call(lambda timeout: broken.generate("prompt", timeout))
+    assert policy.breaker.state == "open"
+
+    time.sleep(RESET_SECONDS * 1.5)
+    assert policy.breaker.state == "half_open"
+
+def test_breaker_opens_after_threshold_and_rejects_calls():
+    policy = make_policy()
+    broken = fake(error_rate=1.0)
+
+    for _ in range(2):
+        with pytest.raises(FakeLLMError):
+            policy.call(lambda timeout: broken.generate("prompt", timeout))
+
+    healthy = fake()
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda timeout: healthy.generate("prompt", timeout))
+    assert healthy.calls == 0
+
+def test_successful_trial_closes_breaker():
+    policy = make_policy()
+    open_circuit(policy)
+
+    healthy = fake()
+    assert policy.call(lambda timeout: healthy.generate("prompt", timeout)) == healthy.respond("prompt")
+    assert policy.breaker.state == "closed"
+
+def test_failed_trial_reopens_breaker():
+    policy = make_policy()
+    open_circuit(policy)
+
+    broken = fake(error_rate=1.0)
+    with pytest.raises(FakeLLMError):
+        policy.call(lambda timeout: broken.generate("prompt", timeout))
+    assert policy.breaker.state == "open"
+
+def test_non_retryable_trial_failure_reopens_and_releases_trial():
+    policy = make_policy()
+    open_circuit(policy)
+
+    def invalid(timeout):
+        raise ValueError("bad response")
+
+    with pytest.raises(ValueError):
+        policy.call(invalid)
+    assert policy.breaker.state == "open"
+
+    # Once the cool-down has passed, a new trial is let through
+    time.sleep(RESET_SECONDS * 1.5)
+    healthy = fake()
+    policy.call(lambda timeout: healthy.generate("prompt", timeout))
+    assert policy.breaker.state == "closed"
+
+def test_cancelled_trial_releases_trial():
+    policy = make_policy()
+    open_circuit(policy)
+    slow = fake(latency_ms=500)
+
+    async def cancel_trial():
+        task = asyncio.ensure_future(policy.acall(lambda timeout: slow.agenerate("prompt", timeout)))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+
+    healthy = fake()
+    asyncio.run(policy.acall(lambda timeout: healthy.agenerate("prompt", timeout)))
+    assert policy.breaker.state == "closed"
+
+def test_only_one_trial_at_a_time():
+    policy = make_policy()
+    open_circuit(policy)
+    slow, healthy = fake(latency_ms=200), fake()
+
+    async def concurrent_calls():
+        trial = asyncio.ensure_future(policy.acall(lambda timeout: slow.agenerate("prompt", timeout)))
+        await asyncio.sleep(0.02)
+        with pytest.raises(CircuitOpenError):
+            await policy.acall(lambda timeout: healthy.agenerate("prompt", timeout))
+        await trial
+
+    asyncio.run(concurrent_calls())
+    assert policy.breaker.state == "closed"
+
+def test_retries_transient_errors_until_success():
+    policy = make_policy(max_retries=3, breaker=CircuitBreaker(failure_threshold=10))
+    fn = failing_then(fake(), failures=2)
+
+    assert policy.call(fn) == fake().respond("prompt")
+    assert len(fn.calls) == 3
+    assert policy.stats()["retries"] == 2
+
+def test_does_not_retry_client_errors():
+    policy = make_policy(max_retries=3, breaker=CircuitBreaker(failure_threshold=10))
+    fn = failing_then(fake(), failures=1, code=400)
+
+    with pytest.raises(FakeLLMError):
+        policy.call(fn)
+    assert len(fn.calls) == 1
+
+def test_gives_up_after_max_retries():
+    policy = make_policy(max_retries=2, breaker=CircuitBreaker(failure_threshold=10))
+    fn = failing_then(fake(), failures=10)
+
+    with pytest.raises(FakeLLMError):
+        policy.call(fn)
+    assert len(fn.calls) == 3
+
+def test_slow_attempt_times_out_and_is_retried():
+    policy = make_policy(attempt_timeout=0.05, max_retries=1, breaker=CircuitBreaker(failure_threshold=10))
+    slow = fake(latency_ms=1000)
+
+    with pytest.raises(TimeoutError):
+        policy.call(lambda timeout: slow.generate("prompt", timeout))
+    assert slow.calls == 2
+    assert policy.stats()["retries"] == 1
+
+def test_hedged_request_wins_when_first_is_slow():
+    policy = make_policy(attempt_timeout=1.0, hedge=True, hedge_min_delay=0.05)
+    backend = fake()
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            time.sleep(0.9)
+            return "slow"
+        return backend.generate("prompt", timeout)
+
+    assert policy.call(fn) == backend.respond("prompt")
+    assert policy.stats()["hedges"] == 1
+    assert policy.stats()["hedge_wins"] == 1
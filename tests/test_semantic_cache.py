@@ -0,0 +1,55 @@
+"""Semantic answer cache lookups are scoped to the subject, model and temperature."""
+import sqlite3
+
+from semantic_cache import HashedNgramEmbedder, SemanticCache
+
+QUESTION = "What is a Python list comprehension?"
+SIMILAR = "what is a python list comprehension"
+
+def test_hit_for_similar_question_from_same_model(tmp_path):
+    cache = SemanticCache(str(tmp_path / "cache.db"))
+    cache.add("Python", QUESTION, "answer", "gemini", 0.7)
+
+    assert cache.lookup("python", SIMILAR, "gemini", 0.7) == "answer"
+
+def test_other_model_or_temperature_misses(tmp_path):
+    cache = SemanticCache(str(tmp_path / "cache.db"))
+    cache.add("Python", QUESTION, "fake answer", "fake", 0.7)
+
+    assert cache.lookup("Python", QUESTION, "gemini", 0.7) is None
+    assert cache.lookup("Python", QUESTION, "fake", 0.2) is None
+
+def test_bound_question_passes_model_settings(tmp_path):
+    cache = SemanticCache(str(tmp_path / "cache.db"))
+    cache.bind("Python", QUESTION).put("prompt", "fake", 0.7, "fake answer")
+
+    assert cache.bind("Python", SIMILAR).get("other prompt", "gemini", 0.7) is None
+    assert cache.bind("Python", SIMILAR).get("other prompt", "fake", 0.7) == "fake answer"
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SemanticCache(path).add("Python", QUESTION, "answer", "gemini", 0.7)
+
+    reopened = SemanticCache(path)
+    assert reopened.lookup("Python", QUESTION, "gemini", 0.7) == "answer"
+    assert reopened.lookup("Python", QUESTION, "fake", 0.7) is None
+
+def test_legacy_entries_without_model_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute('''
+            CREATE TABLE answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, subject TEXT NOT NULL, question TEXT NOT NULL,
+                answer TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL
+            )
+        ''')
+        conn.execute(
+            "INSERT INTO answers (subject, question, answer, vector, created_at) VALUES (?, ?, ?, ?, 0)",
+            ("Python", QUESTION, "unknown origin", HashedNgramEmbedder().embed(QUESTION).tobytes())
+        )
+    conn.close()
+
+    cache = SemanticCache(path)
+    assert cache.stats()["size"] == 0
+    cache.add("Python", QUESTION, "answer", "gemini", 0.7)
+    assert cache.lookup("Python", QUESTION, "gemini", 0.7) == "answer"
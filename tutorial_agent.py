@@ -1,12 +1,31 @@
-from typing import Dict, List, Any, TypedDict, Annotated
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from langgraph.graph import StateGraph, END
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Iterator, Tuple, TypedDict, Annotated
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, RemoveMessage
+from langchain_core.runnables import RunnableLambda, RunnableConfig
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from database import TutorialDatabase
+from response_cache import ResponseCache
+from prefetch import EvaluationPrefetcher
+from summarizer import ConversationSummarizer
 
 # Import the existing API configuration
-from LLM_api import call_gemini
-from config import LLM_MODEL, SITE_URL, SITE_NAME
+from LLM_api import call_gemini, acall_gemini, call_gemini_stream, generate_text, get_backend
+from llm_backends import LLMBackend
+from context_builder import ContextBuilder, truncate_tokens
+from instrumentation import metrics, timed
+from config import LLM_MODEL, SITE_URL, SITE_NAME, HISTORY_WINDOW_MESSAGES, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_NODES
+from config import EXAMPLE_SUBJECTS, PREWARM_MAX_AGE_SECONDS, PREWARM_WORKERS, PREFETCH_EVALUATIONS, SEMANTIC_CACHE_ENABLED
+from config import SUMMARY_ENABLED, CONTEXT_SUMMARY_TOKENS, CONTEXT_MESSAGE_MAX_TOKENS, BATCH_WORKERS, LLM_USAGE_TRACKING
+
+logger = logging.getLogger(__name__)
 
 class TutorialState(TypedDict):
     """State object for the tutorial agent."""
@@ -16,13 +35,65 @@ class TutorialState(TypedDict):
     current_mode: str  # 'tutorial', 'qa', 'evaluation'
     evaluation_count: int
     user_understanding: Dict[str, Any]
+    summary: str  # Rolling summary of turns older than the history window
+    input_type: str  # 'tutorial', 'question', 'evaluation_request'
 
 class TutorialAgent:
     """LangGraph-based Evihian."""
 
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        self._llm = backend
+        self.context = ContextBuilder()
         self.db = TutorialDatabase()
-        self.graph = self._create_graph()
+        self.response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
+        if self.response_cache is not None:
+            metrics.register_collector("response_cache", self.response_cache.stats)
+        self.prefetcher = EvaluationPrefetcher() if PREFETCH_EVALUATIONS else None
+        self.summarizer = ConversationSummarizer(self.db, self._summarize) if SUMMARY_ENABLED else None
+
+        # LLM calls made during a turn, per conversation, until the turn's unit of work commits them
+        self._turn_usage: Dict[int, List[Dict[str, Any]]] = {}
+        self._turn_usage_lock = threading.Lock()
+
+        self.semantic_cache = None
+        if SEMANTIC_CACHE_ENABLED:
+            # Imported here so numpy is only loaded when the cache is enabled
+            from semantic_cache import SemanticCache
+            self.semantic_cache = SemanticCache()
+
+    @property
+    def llm(self) -> LLMBackend:
+        """The agent's LLM backend; the default one is created on first use."""
+        if self._llm is None:
+            self._llm = get_backend()
+        return self._llm
+
+    @cached_property
+    def checkpointer(self):
+        """The SQLite store of each conversation's graph state, opened on first use."""
+        # Imported here so the checkpoint backend only loads once a graph is built
+        from checkpointer import ConversationCheckpointer
+        return ConversationCheckpointer.open()
+
+    @cached_property
+    def graph(self):
+        """The compiled workflow, built on first use."""
+        return self._create_graph()
+
+    def close(self):
+        """Stop the background prefetch and summary workers, then flush and close the database."""
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+        if self.summarizer is not None:
+            self.summarizer.shutdown()
+
+        # Calls from turns that never saved (an abandoned stream) are still accounted for
+        with self._turn_usage_lock:
+            leftover = [call for calls in self._turn_usage.values() for call in calls]
+            self._turn_usage.clear()
+        self._record_usage(leftover)
+
+        self.db.close()
 
     def _create_graph(self) -> StateGraph:
         """Create the LangGraph workflow."""
@@ -32,14 +103,25 @@ class TutorialAgent:
         # Nodes are the states of the agent, and edges are the transitions between states.
         # Edges are the transitions between states.
 
-        # Add nodes
-        workflow.add_node("generate_tutorial", self._generate_tutorial)
-        workflow.add_node("handle_question", self._handle_question)
-        workflow.add_node("create_evaluation", self._create_evaluation)
-        workflow.add_node("evaluate_answer", self._evaluate_answer)
+        # Add nodes, each with a sync and an async implementation so the
+        # compiled graph can be run with either invoke or ainvoke
+        workflow.add_node("generate_tutorial", RunnableLambda(self._generate_tutorial, afunc=self._agenerate_tutorial))
+        workflow.add_node("handle_question", RunnableLambda(self._handle_question, afunc=self._ahandle_question))
+        workflow.add_node("create_evaluation", RunnableLambda(self._create_evaluation, afunc=self._acreate_evaluation))
+        workflow.add_node("evaluate_answer", RunnableLambda(self._evaluate_answer, afunc=self._aevaluate_answer))
+        workflow.add_node("trim_history", self._trim_history)
 
-        # Set entry point
-        workflow.set_entry_point("generate_tutorial")
+        # Each run handles one input: a new tutorial or one conversation turn
+        workflow.add_conditional_edges(
+            START,
+            self._route_turn,
+            {
+                "tutorial": "generate_tutorial",
+                "question": "handle_question",
+                "evaluation": "create_evaluation",
+                "answer": "evaluate_answer"
+            }
+        )
 
         # Add conditional edges based on user input and current mode
         workflow.add_conditional_edges(
@@ -48,7 +130,7 @@ class TutorialAgent:
             {
                 "question": "handle_question",
                 "evaluation": "create_evaluation",
-                "end": END
+                "end": "trim_history"
             }
         )
 
@@ -58,7 +140,7 @@ class TutorialAgent:
             {
                 "question": "handle_question",
                 "evaluation": "create_evaluation",
-                "end": END
+                "end": "trim_history"
             }
         )
 
@@ -68,7 +150,7 @@ class TutorialAgent:
             {
                 "question": "handle_question",
                 "evaluation": "create_evaluation",
-                "end": END
+                "end": "trim_history"
             }
         )
 
@@ -78,17 +160,24 @@ class TutorialAgent:
             {
                 "question": "handle_question",
                 "evaluation": "create_evaluation",
-                "end": END
+                "end": "trim_history"
             }
         )
 
-        return workflow.compile()
+        workflow.add_edge("trim_history", END)
 
-    def _generate_tutorial(self, state: TutorialState) -> TutorialState:
-        """Generate initial tutorial content for the subject."""
-        subject = state["subject"]
+        # State is checkpointed per conversation, so a turn resumes from the last checkpoint
+        return workflow.compile(checkpointer=self.checkpointer)
+
+    @timed("agent_prompt_seconds")
+    def _tutorial_prompt(self, state: TutorialState) -> str:
+        """Build the prompt for the initial tutorial."""
+        return self._tutorial_template(state["subject"])
 
-        prompt = f"""You are an expert AI tutor. Create a comprehensive but concise tutorial about {subject}.
+    @staticmethod
+    def _tutorial_template(subject: str) -> str:
+        """The tutorial prompt text; untimed so _tutorial_version doesn't record a prompt span."""
+        return f"""You are an expert AI tutor. Create a comprehensive but concise tutorial about {subject}.
 
 Structure your response as follows:
 1. Brief introduction to the topic
@@ -100,34 +189,177 @@ Structure your response as follows:
 Keep the tutorial engaging, educational, and appropriate for beginners to intermediate learners.
 Use clear examples and explanations. Aim for about 300-500 words."""
 
-        response = self._call_llm(prompt)
-
+    def _save_tutorial(self, state: TutorialState, response: str) -> TutorialState:
+        """Persist the generated tutorial and return the updated state."""
         # Save to database
-        self.db.add_message(
-            state["conversation_id"],
-            "assistant",
-            response,
-            "tutorial"
-        )
+        with self.db.unit_of_work() as uow:
+            uow.add_message(
+                state["conversation_id"],
+                "assistant",
+                response,
+                "tutorial"
+            )
+            uow.add_llm_calls(self._take_usage(state["conversation_id"]))
 
         tutorial_message = AIMessage(content=response)
 
-        return {
+        result = {
             **state,
             "messages": state["messages"] + [tutorial_message],
             "current_mode": "qa"
         }
+        self._prefetch_evaluation(result)
 
-    def _handle_question(self, state: TutorialState) -> TutorialState:
-        """Handle user questions about the tutorial content."""
+        return result
+
+    @timed("agent_node_seconds", node="generate_tutorial")
+    def _generate_tutorial(self, state: TutorialState, config: Optional[RunnableConfig] = None) -> TutorialState:
+        """Generate initial tutorial content for the subject."""
+        prewarmed = self._prewarmed_tutorial(state["subject"])
+        response = self._respond(self._tutorial_prompt(state), "generate_tutorial", state, config, prewarmed)
+        return self._save_tutorial(state, response)
+
+    @timed("agent_node_seconds", node="generate_tutorial")
+    async def _agenerate_tutorial(self, state: TutorialState) -> TutorialState:
+        """Async variant of _generate_tutorial."""
+        # SQLite calls run on a worker thread so the event loop keeps serving other sessions
+        response = await asyncio.to_thread(self._prewarmed_tutorial, state["subject"])
+        if response is None:
+            response = await self._acall_llm(self._tutorial_prompt(state), "generate_tutorial", state)
+        return await asyncio.to_thread(self._save_tutorial, state, response)
+
+    def _tutorial_version(self) -> str:
+        """Fingerprint the tutorial prompt and model, so changing either retires pre-warmed tutorials."""
+        template = self._tutorial_template("{subject}")
+        return hashlib.sha256(f"{self.llm.model_name}\0{template}".encode("utf-8")).hexdigest()[:16]
+
+    def _prewarmed_tutorial(self, subject: str) -> Optional[str]:
+        """Return a fresh pre-generated tutorial for the subject, if there is one."""
+        return self.db.get_prewarmed_tutorial(subject, self._tutorial_version(), PREWARM_MAX_AGE_SECONDS)
+
+    def prewarm_tutorials(self, subjects: Optional[List[str]] = None, max_workers: int = PREWARM_WORKERS, force: bool = False) -> Dict[str, str]:
+        """Pre-generate tutorials in parallel for subjects without a fresh stored copy.
+
+        Returns the outcome per subject: "fresh", "generated" or "failed: <error>".
+        """
+        subjects = subjects if subjects is not None else EXAMPLE_SUBJECTS
+        version = self._tutorial_version()
+        results = {}
+
+        pending = []
+        for subject in subjects:
+            if not force and self._prewarmed_tutorial(subject) is not None:
+                results[subject] = "fresh"
+            else:
+                pending.append(subject)
+
+        def generate(subject: str):
+            content = self._generate_text(self._tutorial_prompt({"subject": subject}), "prewarm_tutorial", None)
+            self.db.save_prewarmed_tutorial(subject, version, content)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(generate, subject): subject for subject in pending}
+            for future in as_completed(futures):
+                subject = futures[future]
+                try:
+                    future.result()
+                    results[subject] = "generated"
+                except Exception as e:
+                    results[subject] = f"failed: {str(e)}"
+
+        return results
+
+    @timed("agent_turn_seconds", log_level=logging.INFO)
+    def start_tutorials(self, requests: List[Tuple[str, str]], max_workers: int = BATCH_WORKERS) -> List[Dict[str, Any]]:
+        """Start tutorials for many (session_id, subject) pairs at once.
+
+        Each distinct subject is generated once, concurrently on a bounded
+        pool, and all conversations are written in one transaction. Returns one
+        result per pair, in order, with its conversation_id (None on failure),
+        where the tutorial came from ("prewarmed" or "generated"), the
+        subject's generation latency in seconds, whether it reused another
+        pair's tutorial, and any error.
+        """
+        # Pairs whose subjects only differ in case or spacing share one tutorial
+        keys = [subject.strip().lower() for _, subject in requests]
+        subjects = {}
+        for (_, subject), key in zip(requests, keys):
+            subjects.setdefault(key, subject.strip())
+
+        def generate(subject: str) -> Tuple[Optional[str], str, float, Optional[str], Dict[str, Any]]:
+            started = time.perf_counter()
+            source = "prewarmed"
+            usage = {}
+            try:
+                tutorial = self._prewarmed_tutorial(subject)
+                if tutorial is None:
+                    source = "generated"
+                    prompt = self._tutorial_prompt({"subject": subject})
+                    tutorial = generate_text(prompt, cache=self._cache_for("generate_tutorial", {"subject": subject}), backend=self.llm, usage=usage)
+                return tutorial, source, time.perf_counter() - started, None, usage
+            except Exception as e:
+                usage["error"] = str(e)
+                return None, source, time.perf_counter() - started, str(e), usage
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(generate, subject): key for key, subject in subjects.items()}
+            outcomes = {futures[future]: future.result() for future in as_completed(futures)}
+
+        # Write every successful conversation and its tutorial in one transaction
+        created = [
+            (index, session_id, subject, outcomes[key][0])
+            for index, ((session_id, subject), key) in enumerate(zip(requests, keys))
+            if outcomes[key][0] is not None
+        ]
+        conversation_ids = self.db.create_tutorial_conversations([item[1:] for item in created])
+        ids_by_index = {item[0]: conversation_id for item, conversation_id in zip(created, conversation_ids)}
+
+        # Each generated subject is charged to the first conversation that used it
+        first_ids = {}
+        for index, key in enumerate(keys):
+            first_ids.setdefault(key, ids_by_index.get(index))
+        self._record_usage([
+            self._usage_record(first_ids[key], "generate_tutorial", usage, latency)
+            for key, (_, source, latency, _, usage) in outcomes.items()
+            if source == "generated"
+        ])
+
+        results = []
+        seen = set()
+        for index, ((session_id, subject), key) in enumerate(zip(requests, keys)):
+            _, source, latency, error, _ = outcomes[key]
+            results.append({
+                "session_id": session_id,
+                "subject": subject,
+                "conversation_id": ids_by_index.get(index),
+                "source": source,
+                "latency": latency,
+                "deduplicated": key in seen,
+                "error": error
+            })
+            seen.add(key)
+
+        return results
+
+    def _context(self, state: TutorialState) -> str:
+        """Build the budgeted context: the tutorial, the rolling summary and recent turns."""
+        # The tutorial is always the first message; the user's new input is quoted by the prompt itself
+        tutorial, turns = state["messages"][0].content, state["messages"][1:]
+        if turns and isinstance(turns[-1], HumanMessage):
+            turns = turns[:-1]
+
+        return self.context.build(tutorial, turns, state.get("summary", ""))
+
+    @timed("agent_prompt_seconds")
+    def _question_prompt(self, state: TutorialState) -> str:
+        """Build the prompt answering the user's latest question."""
         subject = state["subject"]
         user_question = state["messages"][-1].content
 
-        # Get conversation context
-        context_messages = state["messages"][-5:]  # Last 5 messages for context
-        context = "\n".join([f"{msg.__class__.__name__[:-7]}: {msg.content}" for msg in context_messages])
+        # Get conversation context within the token budget
+        context = self._context(state)
 
-        prompt = f"""You are an expert AI tutor teaching about {subject}.
+        return f"""You are an expert AI tutor teaching about {subject}.
 
 Previous conversation context:
 {context}
@@ -137,45 +369,64 @@ The student has asked: "{user_question}"
 Provide a clear, detailed explanation that directly answers their question. Use examples where helpful.
 Be encouraging and educational. If the question is off-topic, gently guide them back to {subject}."""
 
-        response = self._call_llm(prompt)
+    def _save_answer(self, state: TutorialState, response: str) -> TutorialState:
+        """Persist the question and its answer and return the updated state."""
+        user_question = state["messages"][-1].content
 
-        # Save to database
-        self.db.add_message(
-            state["conversation_id"],
-            "user",
-            user_question,
-            "question"
-        )
-        self.db.add_message(
-            state["conversation_id"],
-            "assistant",
-            response,
-            "answer"
-        )
+        # Save the exchange to database in one transaction
+        with self.db.unit_of_work() as uow:
+            uow.add_message(
+                state["conversation_id"],
+                "user",
+                user_question,
+                "question"
+            )
+            uow.add_message(
+                state["conversation_id"],
+                "assistant",
+                response,
+                "answer"
+            )
+            uow.add_llm_calls(self._take_usage(state["conversation_id"]))
 
         answer_message = AIMessage(content=response)
 
+        # The question prefetched before this exchange no longer reflects the discussion;
+        # dropping it makes "Test Me" ask live rather than paying for a new guess every turn
+        if self.prefetcher is not None:
+            self.prefetcher.discard(state["conversation_id"])
+
         return {
             **state,
             "messages": state["messages"] + [answer_message],
             "current_mode": "qa"
         }
 
-    def _create_evaluation(self, state: TutorialState) -> TutorialState:
-        """Create evaluation questions to test user understanding."""
+    @timed("agent_node_seconds", node="handle_question")
+    def _handle_question(self, state: TutorialState, config: Optional[RunnableConfig] = None) -> TutorialState:
+        """Handle user questions about the tutorial content."""
+        response = self._respond(self._question_prompt(state), "handle_question", state, config)
+        return self._save_answer(state, response)
+
+    @timed("agent_node_seconds", node="handle_question")
+    async def _ahandle_question(self, state: TutorialState) -> TutorialState:
+        """Async variant of _handle_question."""
+        response = await self._acall_llm(self._question_prompt(state), "handle_question", state)
+        return await asyncio.to_thread(self._save_answer, state, response)
+
+    @timed("agent_prompt_seconds")
+    def _evaluation_prompt(self, state: TutorialState) -> str:
+        """Build the prompt for the next evaluation question."""
         subject = state["subject"]
         evaluation_count = state.get("evaluation_count", 0)
 
-        # Get tutorial content for context
-        tutorial_content = ""
-        for msg in state["messages"]:
-            if isinstance(msg, AIMessage):
-                tutorial_content += msg.content + "\n"
+        # Get tutorial content and recent discussion for context
+        context = self._context(state)
 
-        prompt = f"""You are an expert AI tutor. Based on the tutorial content about {subject}, create a thoughtful evaluation question.
+        return f"""You are an expert AI tutor. Based on the tutorial content about {subject}, create a thoughtful evaluation question.
 
-Tutorial content covered:
-{tutorial_content[:1000]}...
+Content covered so far:
+{context}
 
 Create ONE evaluation question that:
 1. Tests understanding of key concepts
@@ -188,15 +439,19 @@ QUESTION: [Your question here]
 
 This is evaluation question #{evaluation_count + 1}."""
 
-        response = self._call_llm(prompt)
+    def _save_evaluation(self, state: TutorialState, response: str) -> TutorialState:
+        """Persist the evaluation question and return the updated state."""
+        evaluation_count = state.get("evaluation_count", 0)
 
         # Save to database
-        self.db.add_message(
-            state["conversation_id"],
-            "assistant",
-            response,
-            "evaluation_question"
-        )
+        with self.db.unit_of_work() as uow:
+            uow.add_message(
+                state["conversation_id"],
+                "assistant",
+                response,
+                "evaluation_question"
+            )
+            uow.add_llm_calls(self._take_usage(state["conversation_id"]))
 
         eval_message = AIMessage(content=response)
 
@@ -207,13 +462,69 @@ This is evaluation question #{evaluation_count + 1}."""
             "evaluation_count": evaluation_count + 1
         }
 
-    def _evaluate_answer(self, state: TutorialState) -> TutorialState:
-        """Evaluate user's answer to evaluation question."""
+    @timed("agent_node_seconds", node="create_evaluation")
+    def _create_evaluation(self, state: TutorialState, config: Optional[RunnableConfig] = None) -> TutorialState:
+        """Create evaluation questions to test user understanding."""
+        prefetched = self._prefetched_evaluation(state)
+        response = self._respond(self._evaluation_prompt(state), "create_evaluation", state, config, prefetched)
+        return self._save_evaluation(state, response)
+
+    @timed("agent_node_seconds", node="create_evaluation")
+    async def _acreate_evaluation(self, state: TutorialState) -> TutorialState:
+        """Async variant of _create_evaluation."""
+        response = await self._aprefetched_evaluation(state)
+        if response is None:
+            response = await self._acall_llm(self._evaluation_prompt(state), "create_evaluation", state)
+        return await asyncio.to_thread(self._save_evaluation, state, response)
+
+    def _prefetch_evaluation(self, state: TutorialState):
+        """Speculatively generate the question the next evaluation request would get."""
+        if self.prefetcher is None:
+            return
+
+        prompt = self._evaluation_prompt(state)
+        self.prefetcher.schedule(
+            state["conversation_id"],
+            state.get("evaluation_count", 0),
+            lambda: self._generate_text(prompt, "prefetch_evaluation", state["conversation_id"])
+        )
+
+    def _prefetched_evaluation(self, state: TutorialState) -> Optional[str]:
+        """Return the prefetched question for this evaluation, waiting if it is still running."""
+        if self.prefetcher is None:
+            return None
+
+        future = self.prefetcher.take(state["conversation_id"], state.get("evaluation_count", 0))
+        if future is None:
+            return None
+
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    async def _aprefetched_evaluation(self, state: TutorialState) -> Optional[str]:
+        """Async variant of _prefetched_evaluation."""
+        if self.prefetcher is None:
+            return None
+
+        future = self.prefetcher.take(state["conversation_id"], state.get("evaluation_count", 0))
+        if future is None:
+            return None
+
+        try:
+            return await asyncio.wrap_future(future)
+        except Exception:
+            return None
+
+    @timed("agent_prompt_seconds")
+    def _feedback_prompt(self, state: TutorialState) -> str:
+        """Build the prompt giving feedback on the user's evaluation answer."""
         subject = state["subject"]
         user_answer = state["messages"][-1].content
         eval_question = state["messages"][-2].content
 
-        prompt = f"""You are an expert AI tutor evaluating a student's answer about {subject}.
+        return f"""You are an expert AI tutor evaluating a student's answer about {subject}.
 
 Evaluation Question: {eval_question}
 Student's Answer: {user_answer}
@@ -226,36 +537,170 @@ Provide constructive feedback that:
 
 Be supportive and educational. Rate their understanding and provide specific feedback."""
 
-        response = self._call_llm(prompt)
+    def _save_feedback(self, state: TutorialState, response: str) -> TutorialState:
+        """Persist the evaluation answer and its feedback and return the updated state."""
+        user_answer = state["messages"][-1].content
 
-        # Save to database
-        self.db.add_message(
-            state["conversation_id"],
-            "user",
-            user_answer,
-            "evaluation_answer"
-        )
-        self.db.add_message(
-            state["conversation_id"],
-            "assistant",
-            response,
-            "evaluation_feedback"
-        )
+        # Save the exchange to database in one transaction
+        with self.db.unit_of_work() as uow:
+            uow.add_message(
+                state["conversation_id"],
+                "user",
+                user_answer,
+                "evaluation_answer"
+            )
+            uow.add_message(
+                state["conversation_id"],
+                "assistant",
+                response,
+                "evaluation_feedback"
+            )
+            uow.add_llm_calls(self._take_usage(state["conversation_id"]))
 
         feedback_message = AIMessage(content=response)
 
-        return {
+        result = {
             **state,
             "messages": state["messages"] + [feedback_message],
             "current_mode": "qa"
         }
+        self._prefetch_evaluation(result)
+
+        return result
+
+    @timed("agent_node_seconds", node="evaluate_answer")
+    def _evaluate_answer(self, state: TutorialState, config: Optional[RunnableConfig] = None) -> TutorialState:
+        """Evaluate user's answer to evaluation question."""
+        response = self._respond(self._feedback_prompt(state), "evaluate_answer", state, config)
+        return self._save_feedback(state, response)
+
+    @timed("agent_node_seconds", node="evaluate_answer")
+    async def _aevaluate_answer(self, state: TutorialState) -> TutorialState:
+        """Async variant of _evaluate_answer."""
+        response = await self._acall_llm(self._feedback_prompt(state), "evaluate_answer", state)
+        return await asyncio.to_thread(self._save_feedback, state, response)
+
+    def _cache_for(self, node: str, state: TutorialState):
+        """Return the cache the node should consult before calling the LLM, if any."""
+        # Questions are matched by meaning within the subject rather than by exact prompt
+        if node == "handle_question" and self.semantic_cache is not None:
+            return self.semantic_cache.bind(state["subject"], state["messages"][-1].content)
+
+        if node in RESPONSE_CACHE_NODES:
+            return self.response_cache
+        return None
+
+    def _call_llm(self, prompt: str, node: str, state: TutorialState) -> str:
+        """Call the LLM through the agent's backend."""
+        usage, started = {}, time.perf_counter()
+        try:
+            with metrics.span("agent_llm_seconds", node=node):
+                return call_gemini(prompt, cache=self._cache_for(node, state), backend=self.llm, usage=usage)
+        except Exception as e:
+            usage["error"] = str(e)
+            return f"I apologize, but I encountered an error: {str(e)}. Please try again."
+        finally:
+            self._defer_usage(self._usage_record(state["conversation_id"], node, usage, time.perf_counter() - started))
 
-    def _call_llm(self, prompt: str) -> str:
-        """Call the LLM using the Gemini API setup."""
+    async def _acall_llm(self, prompt: str, node: str, state: TutorialState) -> str:
+        """Call the LLM asynchronously through the agent's backend."""
+        usage, started = {}, time.perf_counter()
         try:
-            return call_gemini(prompt)
+            with metrics.span("agent_llm_seconds", node=node):
+                return await acall_gemini(prompt, cache=self._cache_for(node, state), backend=self.llm, usage=usage)
         except Exception as e:
+            usage["error"] = str(e)
             return f"I apologize, but I encountered an error: {str(e)}. Please try again."
+        finally:
+            self._defer_usage(self._usage_record(state["conversation_id"], node, usage, time.perf_counter() - started))
+
+    def _stream_llm(self, prompt: str, node: str, state: TutorialState) -> Iterator[str]:
+        """Stream the LLM response through the agent's backend."""
+        usage, started = {}, time.perf_counter()
+        try:
+            # Only the time spent producing chunks counts, not the time the caller spends rendering them
+            stream = call_gemini_stream(prompt, cache=self._cache_for(node, state), backend=self.llm, usage=usage)
+            yield from metrics.time_iterator("agent_llm_seconds", stream, node=node)
+        except Exception as e:
+            usage["error"] = str(e)
+            yield f"I apologize, but I encountered an error: {str(e)}. Please try again."
+        finally:
+            self._defer_usage(self._usage_record(state["conversation_id"], node, usage, time.perf_counter() - started))
+
+    def _generate_text(self, prompt: str, node: str, conversation_id: Optional[int]) -> str:
+        """Call generate_text for background work, recording the call's usage; raises on failure."""
+        usage, started = {}, time.perf_counter()
+        try:
+            return generate_text(prompt, backend=self.llm, usage=usage)
+        except Exception as e:
+            usage["error"] = str(e)
+            raise
+        finally:
+            self._record_usage([self._usage_record(conversation_id, node, usage, time.perf_counter() - started)])
+
+    def _usage_record(self, conversation_id: Optional[int], node: str, usage: Dict[str, Any], seconds: float) -> Dict[str, Any]:
+        """Build the llm_calls row for a call from the usage LLM_api reported."""
+        return {
+            **usage,
+            "conversation_id": conversation_id,
+            "node": node,
+            "model": self.llm.model_name,
+            "latency_ms": seconds * 1000
+        }
+
+    def _defer_usage(self, call: Dict[str, Any]):
+        """Hold an in-turn call record so it is written in the turn's unit of work."""
+        if not LLM_USAGE_TRACKING:
+            return
+        with self._turn_usage_lock:
+            self._turn_usage.setdefault(call["conversation_id"], []).append(call)
+
+    def _take_usage(self, conversation_id: int) -> List[Dict[str, Any]]:
+        """Remove and return the call records held for a conversation's turn."""
+        with self._turn_usage_lock:
+            return self._turn_usage.pop(conversation_id, [])
+
+    def _record_usage(self, calls: List[Dict[str, Any]]):
+        """Store LLM call records made outside a turn; accounting failures are logged rather than raised."""
+        if not LLM_USAGE_TRACKING or not calls:
+            return
+        try:
+            self.db.record_llm_calls(calls)
+        except Exception:
+            logger.exception("Could not record usage of %d LLM call(s)", len(calls))
+
+    def _respond(
+        self,
+        prompt: str,
+        node: str,
+        state: TutorialState,
+        config: Optional[RunnableConfig],
+        ready: Optional[str] = None
+    ) -> str:
+        """Return the node's response, calling the LLM unless a `ready` one is given.
+
+        When the graph is being streamed, the response is also written to the
+        stream chunk by chunk as it is generated.
+        """
+        if not (config or {}).get("configurable", {}).get("stream_tokens"):
+            return ready if ready is not None else self._call_llm(prompt, node, state)
+
+        writer = get_stream_writer()
+        chunks = []
+        for chunk in [ready] if ready is not None else self._stream_llm(prompt, node, state):
+            chunks.append(chunk)
+            writer(chunk)
+        return "".join(chunks)
+
+    def _route_turn(self, state: TutorialState) -> str:
+        """Route a run to the node for its input."""
+        if state.get("input_type") == "tutorial":
+            return "tutorial"
+        if state["current_mode"] == "evaluation":
+            return "answer"
+        if state.get("input_type") == "evaluation_request":
+            return "evaluation"
+        return "question"
 
     def _route_after_tutorial(self, state: TutorialState) -> str:
         """Route after tutorial generation - wait for user input."""
@@ -273,88 +718,226 @@ Be supportive and educational. Rate their understanding and provide specific fee
         """Route after evaluating user's answer."""
         return "end"  # End and wait for next user input
 
-    def start_tutorial(self, session_id: str, subject: str) -> Dict[str, Any]:
-        """Start a new tutorial session."""
+    def _begin_tutorial(self, session_id: str, subject: str) -> TutorialState:
+        """Create the conversation and return the graph's initial state."""
         # Create conversation in database
         conversation_id = self.db.create_conversation(session_id, subject)
 
         # Initialize state
-        initial_state = TutorialState(
+        return TutorialState(
             messages=[],
             subject=subject,
             conversation_id=conversation_id,
             current_mode="tutorial",
             evaluation_count=0,
-            user_understanding={}
+            user_understanding={},
+            summary="",
+            input_type="tutorial"
         )
 
-        # Generate tutorial
-        result = self.graph.invoke(initial_state)
-
+    def _finish_tutorial(self, result: TutorialState) -> Dict[str, Any]:
+        """Build the response for a new tutorial."""
         return {
-            "conversation_id": conversation_id,
+            "conversation_id": result["conversation_id"],
             "response": result["messages"][-1].content,
             "mode": result["current_mode"]
         }
 
-    def continue_conversation(self, conversation_id: int, user_input: str, input_type: str = "question") -> Dict[str, Any]:
-        """Continue an existing conversation."""
-        # Get conversation history
-        history = self.db.get_conversation_history(conversation_id)
+    @timed("agent_turn_seconds", log_level=logging.INFO)
+    def start_tutorial(self, session_id: str, subject: str) -> Dict[str, Any]:
+        """Start a new tutorial session."""
+        initial_state = self._begin_tutorial(session_id, subject)
+        config = self.checkpointer.thread(initial_state["conversation_id"])
 
-        # Reconstruct state
-        messages = []
-        conversation_info = None
+        # Generate tutorial; only the state at the end of the run is checkpointed
+        result = self.graph.invoke(initial_state, config, durability="exit")
 
-        # Get conversation info from database
-        import sqlite3
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT subject FROM conversations WHERE id = ?", (conversation_id,))
-        result = cursor.fetchone()
-        conn.close()
+        return self._finish_tutorial(result)
 
-        if not result:
-            return {"error": "Conversation not found"}
+    @timed("agent_turn_seconds", log_level=logging.INFO)
+    async def astart_tutorial(self, session_id: str, subject: str) -> Dict[str, Any]:
+        """Async variant of start_tutorial."""
+        initial_state = await asyncio.to_thread(self._begin_tutorial, session_id, subject)
+        config = self.checkpointer.thread(initial_state["conversation_id"])
+
+        # Generate tutorial; only the state at the end of the run is checkpointed
+        result = await self.graph.ainvoke(initial_state, config, durability="exit")
+
+        return self._finish_tutorial(result)
 
-        subject = result[0]
+    def start_tutorial_stream(self, session_id: str, subject: str) -> Dict[str, Any]:
+        """Start a new tutorial session, streaming the tutorial as it is generated."""
+        initial_state = self._begin_tutorial(session_id, subject)
+
+        return {
+            "conversation_id": initial_state["conversation_id"],
+            "stream": self._stream_graph(initial_state["conversation_id"], initial_state)
+        }
+
+    @timed("agent_turn_seconds", log_level=logging.INFO, function="stream_graph")
+    def _stream_graph(self, conversation_id: int, graph_input: Dict[str, Any]) -> Iterator[str]:
+        """Run the graph for a conversation, yielding the response chunks its node writes."""
+        config = self.checkpointer.thread(conversation_id)
+        config["configurable"]["stream_tokens"] = True
+
+        yield from self.graph.stream(graph_input, config, stream_mode="custom", durability="exit")
+        self.checkpointer.finish_turn(conversation_id)
+
+    def _load_state(self, conversation_id: int) -> Optional[TutorialState]:
+        """Rebuild a conversation's state from the most recent window of its history.
+
+        Only used for conversations that have no checkpoint yet.
+        """
+        # Get conversation info and recent messages from database
+        tail = self.db.get_conversation_tail(conversation_id, HISTORY_WINDOW_MESSAGES)
+
+        if not tail:
+            return None
+
+        history = tail["messages"]
+
+        # Keep the tutorial first even once it has scrolled out of the window
+        if tail["has_more"]:
+            tutorial = self.db.get_first_message(conversation_id, "tutorial")
+            if tutorial:
+                history = [tutorial] + history
 
         # Convert history to messages
+        messages = []
         for msg in history:
             if msg["role"] == "user":
                 messages.append(HumanMessage(content=msg["content"]))
             else:
                 messages.append(AIMessage(content=msg["content"]))
 
-        # Add new user message
-        messages.append(HumanMessage(content=user_input))
-
-        # Determine current state
+        # Check if an evaluation question is waiting for an answer
         current_mode = "qa"
-        evaluation_count = len([msg for msg in history if msg.get("message_type") == "evaluation_question"])
+        if tail["last_message_type"] == "evaluation_question":
+            current_mode = "evaluation"
 
-        # Check if this is an evaluation answer
-        if history and history[-1].get("message_type") == "evaluation_question":
-            current_mode = "evaluation_answer"
-
-        state = TutorialState(
+        return TutorialState(
             messages=messages,
-            subject=subject,
+            subject=tail["subject"],
             conversation_id=conversation_id,
             current_mode=current_mode,
-            evaluation_count=evaluation_count,
-            user_understanding={}
+            evaluation_count=tail["evaluation_count"],
+            user_understanding={},
+            summary=tail["summary"] or ""
+        )
+
+    def _trim_messages(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Keep the tutorial plus the most recent window of messages."""
+        if len(messages) <= HISTORY_WINDOW_MESSAGES + 1:
+            return messages
+
+        return messages[:1] + messages[-HISTORY_WINDOW_MESSAGES:]
+
+    def _summarize(self, conversation_id: int, subject: str, previous: str, messages: List[Dict[str, Any]]) -> str:
+        """Fold older messages into the conversation's summary with the LLM; raises on failure."""
+        turns = "\n".join(
+            f"{'Student' if msg['role'] == 'user' else 'Tutor'}: {truncate_tokens(msg['content'], CONTEXT_MESSAGE_MAX_TOKENS)}"
+            for msg in messages
         )
 
-        # Process based on input type and current mode
-        if current_mode == "evaluation_answer":
-            result = self._evaluate_answer(state)
-        elif input_type == "evaluation_request":
-            result = self._create_evaluation(state)
+        prompt = f"""You are keeping a running summary of a tutoring session about {subject} so the tutor remembers earlier discussion.
+
+Current summary:
+{previous or "(none yet)"}
+
+New conversation turns to add:
+{turns}
+
+Write the updated summary as a single paragraph of at most {CONTEXT_SUMMARY_TOKENS * 3 // 4} words.
+Keep the topics covered, the student's questions, any evaluation questions and how well they were answered, and misconceptions to revisit.
+Do not add anything that was not said."""
+
+        return self._generate_text(prompt, "summarize", conversation_id).strip()
+
+    @timed("agent_node_seconds", node="trim_history")
+    def _trim_history(self, state: TutorialState) -> Dict[str, Any]:
+        """Drop messages older than the history window from the checkpointed state."""
+        # Only a bounded window is kept, so each checkpoint stays the same size
+        messages = state["messages"]
+        kept = self._trim_messages(messages)
+        dropped = messages[1:len(messages) - len(kept) + 1]
+
+        if not dropped:
+            return {}
+
+        # Turns leaving the window live on in the rolling summary: the stored LLM summary
+        # is updated in the background, otherwise their first sentences are kept in the state
+        update = {"messages": [RemoveMessage(id=message.id) for message in dropped]}
+        if self.summarizer is not None:
+            self.summarizer.schedule(state["conversation_id"])
         else:
-            result = self._handle_question(state)
+            update["summary"] = self.context.fold(state.get("summary", ""), dropped)
+        return update
+
+    def _begin_turn(self, conversation_id: int, user_input: str, input_type: str) -> Optional[Dict[str, Any]]:
+        """Get the graph input for a turn, or None if the conversation does not exist."""
+        graph_input = {
+            "messages": [HumanMessage(content=user_input)],
+            "input_type": input_type
+        }
+
+        # The graph resumes from the conversation's checkpoint; older conversations are replayed once
+        if self.checkpointer.get_tuple(self.checkpointer.thread(conversation_id)) is None:
+            state = self._load_state(conversation_id)
+
+            if state is None:
+                return None
+
+            graph_input = {**state, **graph_input, "messages": state["messages"] + graph_input["messages"]}
+
+        elif self.summarizer is not None:
+            # The summarizer only writes to the database; the turn picks up its latest summary
+            # here, so checkpoints are only ever written by graph runs
+            stored = self.db.get_summary(conversation_id)
+            if stored:
+                graph_input["summary"] = stored["summary"]
+
+        return graph_input
+
+    def _finish_turn(self, conversation_id: int, result: TutorialState) -> Dict[str, Any]:
+        """Count the turn towards the next checkpoint prune and build the response."""
+        self.checkpointer.finish_turn(conversation_id)
 
         return {
             "response": result["messages"][-1].content,
             "mode": result["current_mode"]
         }
+
+    @timed("agent_turn_seconds", log_level=logging.INFO)
+    def continue_conversation(self, conversation_id: int, user_input: str, input_type: str = "question") -> Dict[str, Any]:
+        """Continue an existing conversation."""
+        graph_input = self._begin_turn(conversation_id, user_input, input_type)
+
+        if graph_input is None:
+            return {"error": "Conversation not found"}
+
+        # The graph routes on the input type and current mode
+        result = self.graph.invoke(graph_input, self.checkpointer.thread(conversation_id), durability="exit")
+
+        return self._finish_turn(conversation_id, result)
+
+    @timed("agent_turn_seconds", log_level=logging.INFO)
+    async def acontinue_conversation(self, conversation_id: int, user_input: str, input_type: str = "question") -> Dict[str, Any]:
+        """Async variant of continue_conversation."""
+        graph_input = await asyncio.to_thread(self._begin_turn, conversation_id, user_input, input_type)
+
+        if graph_input is None:
+            return {"error": "Conversation not found"}
+
+        # The graph routes on the input type and current mode
+        result = await self.graph.ainvoke(graph_input, self.checkpointer.thread(conversation_id), durability="exit")
+
+        return await asyncio.to_thread(self._finish_turn, conversation_id, result)
+
+    def continue_conversation_stream(self, conversation_id: int, user_input: str, input_type: str = "question") -> Dict[str, Any]:
+        """Continue an existing conversation, streaming the response as it is generated."""
+        graph_input = self._begin_turn(conversation_id, user_input, input_type)
+
+        if graph_input is None:
+            return {"error": "Conversation not found"}
+
+        return {"stream": self._stream_graph(conversation_id, graph_input)}